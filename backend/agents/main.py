@@ -1,10 +1,18 @@
 from flask import Flask, request, jsonify
 import os
+import sys
 from dotenv import load_dotenv
 import json
-import requests
 from flask_cors import CORS
 
+# Make the shared backend modules importable no matter where this app is started from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from deadlines import DEADLINE_FALLBACK, install_deadlines, remaining_time
+from groq_client import post_chat_completion
+from output_budget import apply_detail, create_output_budget, current_detail
+from response_cache import response_cache
+
 
 load_dotenv()
 
@@ -12,42 +20,86 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# Starting max_tokens per agent method; observed completion lengths take over from there
+OUTPUT_TOKEN_DEFAULTS = {
+    "greet": 150,
+    "suggest_section": 200,
+    "get_project_list": 500,
+    "get_project_details": 600,
+    "answer_technical_question": 500,
+    "get_skills_summary": 500,
+    "get_experience_summary": 500,
+    "assess_job_fit": 500,
+    "get_services_overview": 500,
+    "get_service_details": 600,
+    "explain_process": 500,
+    "generate_proposal": 700,
+    "search_web": 500,
+    "compare_technologies": 600,
+    "get_industry_trends": 500,
+}
+output_budget = create_output_budget(OUTPUT_TOKEN_DEFAULTS)
+
+# Seconds each route may spend on LLM calls; longer for the long-form project and research answers
+ROUTE_TIMEOUTS = {
+    "/api/project": 45,
+    "/api/research": 45,
+}
+install_deadlines(app, ROUTE_TIMEOUTS)
+
 
 class BaseAgent:
+    # Seconds a cached response stays valid; subclasses tune this per agent
+    cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    model = "llama3-8b-8192"
+
     def __init__(self, name, description):
         self.name = name
         self.description = description
 
         self.api_key = os.getenv("GROQ_API_KEY")
 
-    def get_response(self, prompt):
+    def get_response(self, prompt, use_cache=True, operation=None):
+        detail = current_detail()
+        prompt = apply_detail(prompt, detail)
+        max_tokens = output_budget.max_tokens_for(operation, detail)
+        cache_key = response_cache.make_key(self.name, f"{self.model}:{max_tokens}", prompt)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Past the request's deadline there's no point calling the model
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            return DEADLINE_FALLBACK
 
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
 
+        try:
             data = {
-                "model": "llama3-8b-8192",
+                "model": self.model,
                 "messages": [
                     {"role": "system", "content": f"You are {self.name}, {self.description}. Respond in a helpful, concise, and professional manner."},
                     {"role": "user", "content": prompt}
                 ],
                 "temperature": 0.7,
-                "max_tokens": 500
+                "max_tokens": max_tokens
             }
 
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
+            response = post_chat_completion(data, self.api_key, timeout=remaining)
 
             if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
+                body = response.json()
+                content = body["choices"][0]["message"]["content"]
+                completion_tokens = (body.get("usage") or {}).get("completion_tokens") or len(content) // 4
+                output_budget.observe(operation, completion_tokens, detail)
+                if use_cache:
+                    response_cache.set(cache_key, content, self.cache_ttl)
+                return content
             else:
                 return f"Error: {response.status_code} - {response.text}"
+        except requests.Timeout:
+            return DEADLINE_FALLBACK
         except Exception as e:
             return f"An error occurred: {str(e)}"
 
@@ -60,16 +112,16 @@ class WelcomeAgent(BaseAgent):
 
     def greet(self, visitor_type=None):
         if visitor_type == "employer":
-            return self.get_response("Generate a warm welcome message for an employer visiting a programmer's portfolio website. Suggest they check out the Projects and Career sections.")
+            return self.get_response("Generate a warm welcome message for an employer visiting a programmer's portfolio website. Suggest they check out the Projects and Career sections.", operation="greet")
         elif visitor_type == "client":
-            return self.get_response("Generate a warm welcome message for a potential client visiting a programmer's portfolio website. Suggest they check out the Services section.")
+            return self.get_response("Generate a warm welcome message for a potential client visiting a programmer's portfolio website. Suggest they check out the Services section.", operation="greet")
         elif visitor_type == "fellow_programmer":
-            return self.get_response("Generate a warm welcome message for a fellow programmer visiting a programmer's portfolio website. Suggest they check out the Projects and Research sections.")
+            return self.get_response("Generate a warm welcome message for a fellow programmer visiting a programmer's portfolio website. Suggest they check out the Projects and Research sections.", operation="greet")
         else:
-            return self.get_response("Generate a general welcome message for a visitor to a programmer's portfolio website. Ask if they are an employer, client, or fellow programmer.")
+            return self.get_response("Generate a general welcome message for a visitor to a programmer's portfolio website. Ask if they are an employer, client, or fellow programmer.", operation="greet")
 
     def suggest_section(self, interest):
-        return self.get_response(f"A visitor to my portfolio website has expressed interest in {interest}. Suggest which section(s) of the website they should visit based on this interest.")
+        return self.get_response(f"A visitor to my portfolio website has expressed interest in {interest}. Suggest which section(s) of the website they should visit based on this interest.", operation="suggest_section")
 
 class ProjectAgent(BaseAgent):
     def __init__(self):
@@ -79,7 +131,7 @@ class ProjectAgent(BaseAgent):
         )
 
     def get_project_list(self):
-        return self.get_response("Generate a list of 3-5 impressive software development projects that could be in a programmer's portfolio. Include a brief description for each.")
+        return self.get_response("Generate a list of 3-5 impressive software development projects that could be in a programmer's portfolio. Include a brief description for each.", operation="get_project_list")
 
     def get_project_details(self, project_id):
         project_prompts = {
@@ -90,10 +142,10 @@ class ProjectAgent(BaseAgent):
 
         prompt = project_prompts.get(
             project_id, f"Describe a project called {project_id} in detail.")
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="get_project_details")
 
     def answer_technical_question(self, project_id, question):
-        return self.get_response(f"Answer this technical question about a project: '{question}'. The project is {project_id}.")
+        return self.get_response(f"Answer this technical question about a project: '{question}'. The project is {project_id}.", operation="answer_technical_question")
 
 class CareerAgent(BaseAgent):
     def __init__(self):
@@ -103,13 +155,13 @@ class CareerAgent(BaseAgent):
         )
 
     def get_skills_summary(self):
-        return self.get_response("Generate a comprehensive summary of technical and professional skills for a full-stack developer's portfolio.")
+        return self.get_response("Generate a comprehensive summary of technical and professional skills for a full-stack developer's portfolio.", operation="get_skills_summary")
 
     def get_experience_summary(self):
-        return self.get_response("Generate a summary of work experience for a full-stack developer with 5+ years of experience.")
+        return self.get_response("Generate a summary of work experience for a full-stack developer with 5+ years of experience.", operation="get_experience_summary")
 
     def assess_job_fit(self, job_description):
-        return self.get_response(f"Assess how well a full-stack developer with 5+ years of experience would fit this job description: '{job_description}'. Highlight matching skills and experience.")
+        return self.get_response(f"Assess how well a full-stack developer with 5+ years of experience would fit this job description: '{job_description}'. Highlight matching skills and experience.", operation="assess_job_fit")
 
 class ClientAgent(BaseAgent):
     def __init__(self):
@@ -119,7 +171,7 @@ class ClientAgent(BaseAgent):
         )
 
     def get_services_overview(self):
-        return self.get_response("Generate an overview of services that a freelance full-stack developer might offer to clients.")
+        return self.get_response("Generate an overview of services that a freelance full-stack developer might offer to clients.", operation="get_services_overview")
 
     def get_service_details(self, service_type):
         service_prompts = {
@@ -130,13 +182,13 @@ class ClientAgent(BaseAgent):
 
         prompt = service_prompts.get(
             service_type, f"Describe {service_type} services in detail.")
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="get_service_details")
 
     def explain_process(self):
-        return self.get_response("Explain the client engagement process for a freelance full-stack developer, from initial consultation to project delivery.")
+        return self.get_response("Explain the client engagement process for a freelance full-stack developer, from initial consultation to project delivery.", operation="explain_process")
 
     def generate_proposal(self, project_description):
-        return self.get_response(f"Generate a project proposal for this client request: '{project_description}'. Include estimated timeline, cost range, and approach.")
+        return self.get_response(f"Generate a project proposal for this client request: '{project_description}'. Include estimated timeline, cost range, and approach.", operation="generate_proposal")
 
 class ResearchAgent(BaseAgent):
     def __init__(self):
@@ -146,13 +198,13 @@ class ResearchAgent(BaseAgent):
         )
 
     def search_web(self, query):
-        return self.get_response(f"Provide information about '{query}' as if you've just searched the web for the latest information. Include key points and insights.")
+        return self.get_response(f"Provide information about '{query}' as if you've just searched the web for the latest information. Include key points and insights.", operation="search_web")
 
     def compare_technologies(self, tech1, tech2):
-        return self.get_response(f"Compare {tech1} vs {tech2} in terms of features, performance, use cases, community support, and future prospects.")
+        return self.get_response(f"Compare {tech1} vs {tech2} in terms of features, performance, use cases, community support, and future prospects.", operation="compare_technologies")
 
     def get_industry_trends(self):
-        return self.get_response("Describe current trends in software development and technology that are important for developers to be aware of.")
+        return self.get_response("Describe current trends in software development and technology that are important for developers to be aware of.", operation="get_industry_trends")
 
 
 welcome_agent = WelcomeAgent()
@@ -174,6 +226,15 @@ def block_default_images():
     return response
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/output-budget/stats', methods=['GET'])
+def output_budget_stats():
+    return jsonify(output_budget.stats())
+
+
 @app.route('/api/welcome', methods=['POST'])
 def welcome_agent_endpoint():
     data = request.json
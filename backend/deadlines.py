@@ -0,0 +1,40 @@
+import os
+import time
+
+from flask import g, has_request_context, request
+
+# Seconds a request may run before its LLM calls give up; X-Request-Timeout-Ms overrides per request
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "30"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", "120"))
+
+DEADLINE_FALLBACK = (
+    "Sorry, this is taking longer than expected. Please try again in a moment, "
+    "or ask for a shorter answer with the X-Response-Detail: brief header."
+)
+
+
+def install_deadlines(app, route_timeouts=None):
+    """Give every request of app a deadline, from the X-Request-Timeout-Ms header or route_timeouts"""
+    route_timeouts = route_timeouts or {}
+
+    @app.before_request
+    def set_request_deadline():
+        g.request_deadline = time.monotonic() + request_timeout(route_timeouts)
+
+
+def request_timeout(route_timeouts):
+    header = request.headers.get("X-Request-Timeout-Ms")
+    if header:
+        try:
+            return min(max(float(header), 0.0) / 1000, MAX_REQUEST_TIMEOUT)
+        except ValueError:
+            pass
+    return route_timeouts.get(request.path, DEFAULT_REQUEST_TIMEOUT)
+
+
+def remaining_time():
+    """Seconds left before the current request's deadline, or None outside a request"""
+    if not has_request_context():
+        return None
+    deadline = g.get("request_deadline")
+    return None if deadline is None else deadline - time.monotonic()
@@ -0,0 +1,99 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# GROQ_BASE_URL points the agents at another endpoint, e.g. the local fake_groq_server.py
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+GROQ_CHAT_COMPLETIONS_URL = f"{GROQ_BASE_URL}/openai/v1/chat/completions"
+
+# Pool and timeout settings, overridable from the environment
+POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """Create a keep-alive session that retries connections refused or dropped while connecting"""
+    # Read errors aren't retried here: urllib3 counts read timeouts as read errors too,
+    # and a completion that timed out must not be resent. read=False raises them as they
+    # are, so callers see requests.ReadTimeout, not a ConnectionError. Resets after the
+    # request was sent are retried once by post_chat_completion instead.
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=False,
+        status=0,
+        other=0,
+        allowed_methods=frozenset(["POST"]),
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def post_chat_completion(payload, api_key, timeout=None):
+    """
+    POST a chat completion request over the shared connection pool.
+
+    timeout, the seconds left before the caller's deadline, tightens the
+    configured connect and read timeouts so a stuck upstream can't pin the
+    worker thread past it.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    connect_timeout, read_timeout = CONNECT_TIMEOUT, READ_TIMEOUT
+    if timeout is not None:
+        connect_timeout, read_timeout = min(connect_timeout, timeout), min(read_timeout, timeout)
+    try:
+        return _post(headers, payload, connect_timeout, read_timeout)
+    except requests.ConnectionError as e:
+        if not _is_connection_reset(e):
+            raise
+        # A pooled keep-alive connection the server closed while idle fails on first use.
+        # Nothing was generated for that request, so it is sent once more.
+        return _post(headers, payload, connect_timeout, read_timeout)
+
+
+def _post(headers, payload, connect_timeout, read_timeout):
+    return get_session().post(
+        GROQ_CHAT_COMPLETIONS_URL,
+        headers=headers,
+        json=payload,
+        timeout=(connect_timeout, read_timeout)
+    )
+
+
+def _is_connection_reset(error):
+    """Whether error is a reset or closed connection after sending, not a failed connect"""
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    # Failed connects have already been retried by the adapter and arrive wrapped in MaxRetryError
+    return not any(isinstance(arg, MaxRetryError) for arg in error.args)
@@ -3,6 +3,10 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 import requests
+from deadlines import DEADLINE_FALLBACK, install_deadlines, remaining_time
+from groq_client import post_chat_completion
+from output_budget import apply_detail, create_output_budget, current_detail
+from response_cache import response_cache
 
 # Load environment variables
 load_dotenv()
@@ -11,39 +15,95 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# Starting max_tokens per agent method; observed completion lengths take over from there
+OUTPUT_TOKEN_DEFAULTS = {
+    "greet": 150,
+    "suggest_program": 200,
+    "celebrate_achievement": 150,
+    "suggest_exercise_alternatives": 400,
+    "suggest_food_alternatives": 400,
+    "provide_nutrition_tips": 400,
+    "debunk_myth": 400,
+    "create_quick_workout": 500,
+    "provide_form_guidance": 500,
+    "suggest_adjustments": 500,
+    "interpret_plateau": 500,
+    "explain_concept": 500,
+    "answer_health_question": 500,
+    "analyze_meal": 500,
+    "analyze_progress": 600,
+    "explain_research_finding": 600,
+    "compare_approaches": 600,
+    "create_initial_assessment": 700,
+    "create_milestone_plan": 700,
+    "create_shopping_list": 700,
+    "generate_workout_plan": 700,
+    "create_educational_content": 700,
+    "create_meal_plan": 700,
+}
+output_budget = create_output_budget(OUTPUT_TOKEN_DEFAULTS)
+
+# Seconds each route may spend on LLM calls; longer for plans and long-form content
+ROUTE_TIMEOUTS = {
+    "/api/health/profile/assessment": 45,
+    "/api/health/workout/plan": 45,
+    "/api/health/nutrition/meal-plan": 45,
+    "/api/health/nutrition/shopping-list": 45,
+    "/api/health/progress/milestone-plan": 45,
+    "/api/health/info/educational-content": 45,
+}
+install_deadlines(app, ROUTE_TIMEOUTS)
+
 class BaseAgent:
+    # Seconds a cached response stays valid; subclasses tune this per agent
+    cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    model = "llama3-8b-8192"
+
     def __init__(self, name, description):
         self.name = name
         self.description = description
         self.api_key = os.getenv("GROQ_API_KEY")
 
-    def get_response(self, prompt):
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+    def get_response(self, prompt, use_cache=True, operation=None):
+        detail = current_detail()
+        prompt = apply_detail(prompt, detail)
+        max_tokens = output_budget.max_tokens_for(operation, detail)
+        cache_key = response_cache.make_key(self.name, f"{self.model}:{max_tokens}", prompt)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Past the request's deadline there's no point calling the model
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            return DEADLINE_FALLBACK
 
+        try:
             data = {
-                "model": "llama3-8b-8192",
+                "model": self.model,
                 "messages": [
                     {"role": "system", "content": f"You are {self.name}, {self.description}. Respond in a helpful, concise, and professional manner."},
                     {"role": "user", "content": prompt}
                 ],
                 "temperature": 0.7,
-                "max_tokens": 500
+                "max_tokens": max_tokens
             }
 
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
+            response = post_chat_completion(data, self.api_key, timeout=remaining)
 
             if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
+                body = response.json()
+                content = body["choices"][0]["message"]["content"]
+                completion_tokens = (body.get("usage") or {}).get("completion_tokens") or len(content) // 4
+                output_budget.observe(operation, completion_tokens, detail)
+                if use_cache:
+                    response_cache.set(cache_key, content, self.cache_ttl)
+                return content
             else:
                 return f"Error: {response.status_code} - {response.text}"
+        except requests.Timeout:
+            return DEADLINE_FALLBACK
         except Exception as e:
             return f"An error occurred: {str(e)}"
 
@@ -68,27 +128,31 @@ class HealthProfileAgentClass(BaseAgent):
         if user_type == "new_user":
             return self.get_response(
                 "Generate a friendly, encouraging greeting for someone new to health and wellness coaching. "
-                "Mention that we'll start by creating a health profile and understanding their goals."
+                "Mention that we'll start by creating a health profile and understanding their goals.",
+                operation="greet"
             )
         elif user_type == "returning_user":
             return self.get_response(
                 "Generate a warm welcome back message for a returning wellness client. "
-                "Ask how they've been progressing with their goals and if they need any adjustments to their plan."
+                "Ask how they've been progressing with their goals and if they need any adjustments to their plan.",
+                operation="greet"
             )
         elif user_type == "fitness_focused":
             return self.get_response(
                 "Generate an energetic greeting for someone primarily interested in fitness. "
-                "Mention that they can check out the Workout Plans section and Nutrition guides."
+                "Mention that they can check out the Workout Plans section and Nutrition guides.",
+                operation="greet"
             )
         else:
             return self.get_response(
                 "Generate a friendly, general greeting for someone interested in health and wellness coaching. "
-                "Ask about their primary health goals to provide more tailored guidance."
+                "Ask about their primary health goals to provide more tailored guidance.",
+                operation="greet"
             )
 
     def suggest_program(self, health_interest):
         prompt = f"Based on a user expressing interest in '{health_interest}', suggest which wellness program would be most beneficial. Options include: Workout Plans, Nutrition Guidance, Stress Management, Sleep Improvement, Health Tracking. Explain why in 1-2 sentences."
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="suggest_program")
         
     def create_initial_assessment(self, user_info):
         """
@@ -112,7 +176,8 @@ class HealthProfileAgentClass(BaseAgent):
         
         Format the response in a friendly, encouraging tone.
         """
-        return self.get_response(prompt)
+        # Assessments are personal, so never serve them from cache
+        return self.get_response(prompt, use_cache=False, operation="create_initial_assessment")
 
 class WorkoutPlanAgentClass(BaseAgent):
     def __init__(self):
@@ -123,7 +188,7 @@ class WorkoutPlanAgentClass(BaseAgent):
     
     def generate_workout_plan(self, user_profile):
         prompt = f"Generate a detailed workout plan for a user with the following profile: {user_profile}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="generate_workout_plan")
     
     def suggest_exercise_alternatives(self, exercise, equipment=None, difficulty=None):
         prompt = f"Suggest alternatives for {exercise} exercise"
@@ -131,17 +196,17 @@ class WorkoutPlanAgentClass(BaseAgent):
             prompt += f" using {equipment} equipment"
         if difficulty:
             prompt += f" at {difficulty} difficulty level"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="suggest_exercise_alternatives")
     
     def create_quick_workout(self, time_available, focus_area, equipment=None):
         prompt = f"Create a quick {time_available} workout focusing on {focus_area}"
         if equipment:
             prompt += f" using {equipment} equipment"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="create_quick_workout")
     
     def provide_form_guidance(self, exercise):
         prompt = f"Provide detailed form guidance for {exercise} exercise"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="provide_form_guidance")
 
 class ProgressTrackingAgentClass(BaseAgent):
     def __init__(self):
@@ -152,25 +217,28 @@ class ProgressTrackingAgentClass(BaseAgent):
     
     def analyze_progress(self, user_data):
         prompt = f"Analyze the following fitness progress data: {user_data}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="analyze_progress")
     
     def suggest_adjustments(self, current_plan, progress_data):
         prompt = f"Suggest adjustments to the following fitness plan based on progress data:\nCurrent Plan: {current_plan}\nProgress Data: {progress_data}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="suggest_adjustments")
     
     def create_milestone_plan(self, goal, current_status, timeframe):
         prompt = f"Create a milestone plan to achieve the following goal:\nGoal: {goal}\nCurrent Status: {current_status}\nTimeframe: {timeframe}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="create_milestone_plan")
     
     def interpret_plateau(self, plateau_data):
         prompt = f"Interpret and provide strategies for overcoming the following fitness plateau: {plateau_data}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="interpret_plateau")
     
     def celebrate_achievement(self, achievement):
         prompt = f"Create an enthusiastic celebration message for the following fitness achievement: {achievement}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="celebrate_achievement")
 
 class HealthInfoAgentClass(BaseAgent):
+    # Educational answers rarely change, so keep them cached for a day
+    cache_ttl = 24 * 3600
+
     def __init__(self):
         super().__init__(
             "HealthEducator",
@@ -179,27 +247,27 @@ class HealthInfoAgentClass(BaseAgent):
     
     def explain_concept(self, concept):
         prompt = f"Explain the following health/fitness concept in detail: {concept}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="explain_concept")
     
     def answer_health_question(self, question):
         prompt = f"Answer the following health/fitness question with evidence-based information: {question}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="answer_health_question")
     
     def debunk_myth(self, myth):
         prompt = f"Debunk the following health/fitness myth with scientific evidence: {myth}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="debunk_myth")
     
     def explain_research_finding(self, research_topic):
         prompt = f"Explain current research findings on the following health/fitness topic: {research_topic}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="explain_research_finding")
     
     def create_educational_content(self, topic, format_type="article"):
         prompt = f"Create educational {format_type} content about the following health/fitness topic: {topic}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="create_educational_content")
     
     def compare_approaches(self, approach1, approach2, goal):
         prompt = f"Compare the following approaches for achieving this health/fitness goal:\nGoal: {goal}\nApproach 1: {approach1}\nApproach 2: {approach2}"
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="compare_approaches")
 
 class NutritionAgentClass(BaseAgent):
     def __init__(self):
@@ -223,14 +291,14 @@ class NutritionAgentClass(BaseAgent):
         Provide approximate calorie counts for each meal.
         Format the response in markdown.
         """
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="create_meal_plan")
     
     def suggest_food_alternatives(self, food, dietary_restriction=None):
         prompt = f"Suggest healthy alternatives for {food}"
         if dietary_restriction:
             prompt += f" that are suitable for someone with {dietary_restriction} dietary restriction"
         prompt += ". Include nutritional benefits of each alternative."
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="suggest_food_alternatives")
     
     def analyze_meal(self, meal_description):
         prompt = f"""
@@ -244,7 +312,7 @@ class NutritionAgentClass(BaseAgent):
         3. Nutritional strengths of this meal
         4. Suggestions for improving nutritional balance
         """
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="analyze_meal")
     
     def provide_nutrition_tips(self, goal):
         prompt = f"""
@@ -257,7 +325,7 @@ class NutritionAgentClass(BaseAgent):
         2. A practical way to implement it
         3. A common mistake to avoid
         """
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="provide_nutrition_tips")
     
     def create_shopping_list(self, dietary_preferences="balanced", days=7):
         prompt = f"""
@@ -274,7 +342,7 @@ class NutritionAgentClass(BaseAgent):
         
         Organize by grocery store section and include approximate quantities.
         """
-        return self.get_response(prompt)
+        return self.get_response(prompt, operation="create_shopping_list")
 
 # Initialize all agents with the new classes
 health_profile_agent = HealthProfileAgentClass()
@@ -283,6 +351,14 @@ nutrition_agent = NutritionAgentClass()
 progress_tracking_agent = ProgressTrackingAgentClass()
 health_info_agent = HealthInfoAgentClass()
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/output-budget/stats', methods=['GET'])
+def output_budget_stats():
+    return jsonify(output_budget.stats())
+
 # Health Profile Agent endpoints
 @app.route('/api/health/profile/greet', methods=['POST'])
 def health_profile_greet():
@@ -0,0 +1,115 @@
+# Copy of server/healthAgents/output_budget.py that reads the detail knob from the Flask
+# request instead of a context variable. The Flask backend and the FastAPI server are
+# deployed separately, each from its own directory with its own dependencies, so neither
+# can import the other's modules. Change both copies together.
+import bisect
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from flask import has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_MAX_TOKENS = 500
+
+# The X-Response-Detail knob scales the standard budget
+DETAIL_MULTIPLIERS = {"brief": 0.5, "standard": 1.0, "detailed": 2.0}
+DETAIL_INSTRUCTIONS = {
+    "brief": "Keep the response brief: only the essentials, no preamble.",
+    "detailed": "Give a thorough, detailed response.",
+}
+
+# Budgets are rounded up to one of these so they, and the cache keys they are part of, move in steps
+BUDGET_BUCKETS = (128, 192, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096)
+
+
+class OutputBudget:
+    """
+    Per-operation max_tokens that follows observed completion lengths.
+
+    Until min_samples completions of an operation have been seen its configured
+    default applies. After that the budget is the observed percentile (over a
+    sliding window) plus headroom, so verbose endpoints get a cap close to what
+    they really produce. A truncated completion lands at the cap and pushes the
+    percentile up, so the budget grows back when it was set too tight.
+    """
+
+    def __init__(self, defaults: Dict[str, int], window: int = 200, min_samples: int = 20,
+                 percentile: float = 95, headroom: float = 1.25, adaptive: bool = True):
+        self.defaults = defaults
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.headroom = headroom
+        self.adaptive = adaptive
+        self._observed: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation: Optional[str], completion_tokens: int, detail: str = "standard"):
+        # Brief and detailed requests would skew the standard budget either way
+        if not operation or detail != "standard" or completion_tokens <= 0:
+            return
+        with self._lock:
+            samples = self._observed.get(operation)
+            if samples is None:
+                samples = self._observed[operation] = deque(maxlen=self.window)
+            samples.append(completion_tokens)
+
+    def standard_budget(self, operation: Optional[str]) -> int:
+        default = self.defaults.get(operation, FALLBACK_MAX_TOKENS)
+        samples = self._observed.get(operation) if self.adaptive else None
+        if not samples or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(64, int(ordered[index] * self.headroom))
+
+    def max_tokens_for(self, operation: Optional[str], detail: str = "standard") -> int:
+        budget = self.standard_budget(operation) * DETAIL_MULTIPLIERS.get(detail, 1.0)
+        return BUDGET_BUCKETS[min(bisect.bisect_left(BUDGET_BUCKETS, budget), len(BUDGET_BUCKETS) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for operation in sorted(set(self.defaults) | set(self._observed)):
+            samples = self._observed.get(operation, ())
+            stats[operation] = {
+                "default": self.defaults.get(operation, FALLBACK_MAX_TOKENS),
+                "samples": len(samples),
+                "standard_budget": self.standard_budget(operation),
+                "max_tokens": {detail: self.max_tokens_for(operation, detail) for detail in DETAIL_MULTIPLIERS},
+            }
+        return stats
+
+
+def current_detail() -> str:
+    """The X-Response-Detail header of the current request, or standard"""
+    detail = request.headers.get("X-Response-Detail", "").lower() if has_request_context() else ""
+    return detail if detail in DETAIL_MULTIPLIERS else "standard"
+
+
+def apply_detail(prompt: str, detail: str) -> str:
+    instruction = DETAIL_INSTRUCTIONS.get(detail)
+    return f"{prompt}\n\n{instruction}" if instruction else prompt
+
+
+def create_output_budget(defaults: Dict[str, int]) -> OutputBudget:
+    """Budget over an app's per-operation defaults, tunable from the environment like the server's"""
+    defaults = dict(defaults)
+    configured = os.getenv("OUTPUT_TOKEN_DEFAULTS")
+    if configured:
+        try:
+            defaults.update(json.loads(configured))
+        except ValueError as e:
+            logger.warning("Ignoring OUTPUT_TOKEN_DEFAULTS, not valid JSON: %s", e)
+    return OutputBudget(
+        defaults,
+        window=int(os.getenv("OUTPUT_BUDGET_WINDOW", "200")),
+        min_samples=int(os.getenv("OUTPUT_BUDGET_MIN_SAMPLES", "20")),
+        percentile=float(os.getenv("OUTPUT_BUDGET_PERCENTILE", "95")),
+        headroom=float(os.getenv("OUTPUT_BUDGET_HEADROOM", "1.25")),
+        adaptive=os.getenv("OUTPUT_BUDGET_ADAPTIVE", "true").lower() == "true",
+    )
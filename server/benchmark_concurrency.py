@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare concurrent throughput of the blocking and async agent call paths.
+
+The upstream Groq completion is replaced by a fixed simulated latency so the
+numbers only reflect how many calls one event loop can keep in flight:
+
+    python benchmark_concurrency.py --requests 50 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import time
+
+from agno.agent import Agent, RunResponse
+from healthAgents import HealthInfoAgent
+
+
+def patch_upstream(latency: float):
+    """Replace the model round trip with a simulated completion"""
+
+    def run(self, message=None, **kwargs):
+        time.sleep(latency)
+        return RunResponse(content=f"Simulated answer to: {str(message)[:40]}")
+
+    async def arun(self, message=None, **kwargs):
+        await asyncio.sleep(latency)
+        return RunResponse(content=f"Simulated answer to: {str(message)[:40]}")
+
+    Agent.run = run
+    Agent.arun = arun
+
+
+async def blocking_path(agent: HealthInfoAgent, requests: int):
+    """What the routes did before: a sync call inside an async handler"""
+
+    async def handler(i):
+        return agent.get_response(f"Explain concept {i}")
+
+    await asyncio.gather(*(handler(i) for i in range(requests)))
+
+
+async def async_path(agent: HealthInfoAgent, requests: int):
+    """What the routes do now: await the agent without blocking the loop"""
+    await asyncio.gather(*(agent.explain_health_concept(f"concept {i}") for i in range(requests)))
+
+
+def measure(label: str, coro_factory, requests: int):
+    start = time.perf_counter()
+    asyncio.run(coro_factory())
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {requests} requests in {elapsed:6.2f}s -> {requests / elapsed:8.1f} req/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="concurrent requests to issue")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated upstream latency in seconds")
+    args = parser.parse_args()
+
+    patch_upstream(args.latency)
+    agent = HealthInfoAgent()
+
+    print("=== Concurrent throughput (one event loop) ===")
+    before = measure("blocking", lambda: blocking_path(agent, args.requests), args.requests)
+    after = measure("async", lambda: async_path(agent, args.requests), args.requests)
+    print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
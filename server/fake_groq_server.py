@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq OpenAI-compatible chat completions API.
+
+Speaks POST /openai/v1/chat/completions (plain and streamed) with simulated
+latency, errors and rate limits, so both apps can be load tested offline:
+
+    python fake_groq_server.py --port 9000 --first-token-latency 0.3 --tokens-per-second 200
+
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake uvicorn main:app          # server/
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake python main.py            # backend/
+
+Every option can also be set through the matching FAKE_GROQ_* environment variable.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_RESPONSES = [
+    "Here is a balanced plan to get you started. Warm up for five minutes, then complete three rounds "
+    "of squats, push-ups and rows with controlled form. Finish with light stretching and stay hydrated.",
+    "Great question! Focus on whole foods, plenty of vegetables, lean protein at every meal and consistent "
+    "sleep. Small sustainable habits beat short bursts of intense effort over the long run.",
+    "You're making real progress. Keep tracking your workouts, celebrate the wins, and adjust one variable "
+    "at a time so you can see what actually moves the needle for you.",
+]
+
+
+class FakeGroqConfig:
+    def __init__(self, first_token_latency=0.2, tokens_per_second=250.0, error_rate=0.0,
+                 rate_limit_rpm=0, max_tokens=None, responses=None):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rpm = rate_limit_rpm
+        self.max_tokens = max_tokens
+        self.responses = responses or DEFAULT_RESPONSES
+
+
+def create_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI(title="Fake Groq API")
+    recent_requests = deque()
+    canned = itertools.cycle(config.responses)
+
+    def rate_limited():
+        """Sliding one-minute window, mirroring the provider's requests-per-minute limit"""
+        if config.rate_limit_rpm <= 0:
+            return None
+        now = time.monotonic()
+        while recent_requests and now - recent_requests[0] >= 60:
+            recent_requests.popleft()
+        if len(recent_requests) >= config.rate_limit_rpm:
+            return max(1, int(60 - (now - recent_requests[0])) + 1)
+        recent_requests.append(now)
+        return None
+
+    def completion_tokens(body):
+        tokens = [word + " " for word in next(canned).split()]
+        limit = body.get("max_tokens") or config.max_tokens
+        return tokens[:limit] if limit else tokens
+
+    def usage(body, tokens):
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+
+    def error_response(status, message, error_type, headers=None):
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": message, "type": error_type}},
+            headers=headers,
+        )
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+
+        retry_after = rate_limited()
+        if retry_after is not None:
+            return error_response(429, "Rate limit reached for requests", "rate_limit_exceeded",
+                                  headers={"retry-after": str(retry_after)})
+        if random.random() < config.error_rate:
+            return error_response(500, "Simulated upstream failure", "internal_server_error")
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        tokens = completion_tokens(body)
+        token_interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.first_token_latency + token_interval * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(body, tokens),
+            }
+
+        def chunk(delta, finish_reason=None, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            await asyncio.sleep(config.first_token_latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(token_interval)
+            yield chunk({}, finish_reason="stop", x_groq={"id": completion_id, "usage": usage(body, tokens)})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def _env(name, default):
+    return os.getenv(f"FAKE_GROQ_{name}", default)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=_env("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(_env("PORT", "9000")))
+    parser.add_argument("--first-token-latency", type=float, default=float(_env("FIRST_TOKEN_LATENCY", "0.2")),
+                        help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=float(_env("TOKENS_PER_SECOND", "250")),
+                        help="generation speed after the first token")
+    parser.add_argument("--error-rate", type=float, default=float(_env("ERROR_RATE", "0")),
+                        help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rpm", type=int, default=int(_env("RATE_LIMIT_RPM", "0")),
+                        help="requests per minute before answering 429 (0 disables)")
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help="cap on completion tokens when the request sets none")
+    parser.add_argument("--responses", default=_env("RESPONSES", None),
+                        help="JSON file with a list of canned completion texts")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    config = FakeGroqConfig(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rpm=args.rate_limit_rpm,
+        max_tokens=args.max_tokens,
+        responses=responses,
+    )
+    print(f"Starting fake Groq server on http://{args.host}:{args.port} ...")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
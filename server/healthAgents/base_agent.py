@@ -1,30 +1,219 @@
 from agno.agent import Agent, RunResponse
-from agno.models.groq import Groq
+from agno.run.response import RunEvent
 import os
 from dotenv import load_dotenv
-from typing import Dict, Any
-from datetime import datetime
+from typing import Callable, Dict, Any
 import json
+import threading
+import time
+from collections import OrderedDict
+from . import metrics
+from .context_store import create_context_store
+from .deadlines import check_deadline, deadline_scope
+from .hedging import hedger
+from .model_router import DEFAULT_TIER, MODEL_TIERS, build_model, model_router
+from .output_budget import apply_detail, current_detail, output_budget
+from .prompt_compaction import estimate_tokens
+from .request_context import current_route
+from .response_cache import response_cache
+from .single_flight import single_flight
+from .upstream_limiter import retry_after_seconds, upstream_limiter
 
 load_dotenv()
 
 class BaseAgent:
+    # Seconds a cached response stays valid; subclasses tune this per agent
+    cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    # Number of memoized per-user context renderings kept per agent
+    context_render_cache_size = int(os.getenv("CONTEXT_RENDER_CACHE_SIZE", "4096"))
+
     def __init__(self, name, description, avatar="default_avatar.png"):
         self.name = name
         self.description = description
         self.avatar = avatar
-        self.model = Groq(id="llama-3.3-70b-versatile")
-        self.agent = Agent(model=self.model, markdown=True)
-        self.context_memory = {}  # Store user context
+        # One agno Agent per (model, max_tokens) the router and output budget send calls to
+        self._agents: Dict[tuple, Agent] = {}
+        self._agents_lock = threading.Lock()
+        self.agent = self._agent_for(MODEL_TIERS[DEFAULT_TIER])
+        self.model = self.agent.model
+        self.context_memory = create_context_store(namespace=name)  # Persistent store of user context
+        # (user_id, kind) -> (last_updated, rendered text); see _render_stored_context
+        self._context_renders: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._context_renders_lock = threading.Lock()
+
+    def _agent_for(self, model_id: str, max_tokens: int = None) -> Agent:
+        key = (model_id, max_tokens)
+        agent = self._agents.get(key)
+        if agent is None:
+            with self._agents_lock:
+                agent = self._agents.get(key)
+                if agent is None:
+                    # Telemetry posts to agno's servers after every run; opt in with AGNO_TELEMETRY=true
+                    agent = Agent(model=build_model(model_id, max_tokens), markdown=True,
+                                  telemetry=os.getenv("AGNO_TELEMETRY", "false").lower() == "true")
+                    self._agents[key] = agent
+        return agent
 
-    def get_response(self, query, stream=False):
+    def _plan_call(self, query, operation):
+        """Pick the model and output budget for a call: (prompt, model_id, max_tokens, detail)"""
+        detail = current_detail()
+        model_id = model_router.model_for(self.name, operation, query)
+        return apply_detail(query, detail), model_id, output_budget.max_tokens_for(operation, detail), detail
+
+    def get_response(self, query, stream=False, use_cache=True, operation=None):
         """Get response content from the agent"""
-        run: RunResponse = self.agent.run(query)
+        prompt, model_id, max_tokens, detail = self._plan_call(query, operation)
+        cache_key = self._cache_key(prompt, model_id, max_tokens)
+        if use_cache:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                return cached
+        check_deadline()
+        run: RunResponse = self._agent_for(model_id, max_tokens).run(prompt)
+        output_budget.observe(operation, self._completion_tokens(run), detail)
+        if use_cache:
+            response_cache.set(cache_key, run.content, self.cache_ttl)
         return run.content
 
+    async def aget_response(self, query, use_cache=True, operation=None):
+        """
+        Get response content from the agent without blocking the event loop.
+
+        operation names the calling method so the model router and output budget
+        can pick a model and max_tokens for it.
+        """
+        prompt, model_id, max_tokens, detail = self._plan_call(query, operation)
+        cache_key = self._cache_key(prompt, model_id, max_tokens)
+        if use_cache:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                return cached
+        # Identical prompts already in flight share a single upstream call, which slow
+        # operations may hedge. Hitting the request deadline stops waiting, and cancels
+        # the call once no one else waits on it.
+        async with deadline_scope():
+            content = await single_flight.do(cache_key, lambda: hedger.run(
+                operation, model_id, lambda model: self._arun_content(prompt, model, max_tokens, operation, detail)
+            ))
+        if use_cache:
+            response_cache.set(cache_key, content, self.cache_ttl)
+        return content
+
+    async def _arun_content(self, prompt, model_id: str, max_tokens: int, operation=None,
+                            detail: str = "standard") -> str:
+        route = current_route.get()
+        # Every upstream call queues here first; see UpstreamLimiter
+        async with upstream_limiter.slot(model_id, estimate_tokens(prompt) + max_tokens) as reservation:
+            metrics.llm_model_calls.inc(self.name, operation or "unspecified", model_id)
+            started = time.perf_counter()
+            try:
+                # Pass stream explicitly: agno keeps the agent in stream mode after a streamed run
+                run: RunResponse = await self._agent_for(model_id, max_tokens).arun(prompt, stream=False)
+            except Exception as e:
+                metrics.llm_errors.inc(route, self.name, type(e).__name__)
+                raise self._upstream_error(e)
+            finally:
+                metrics.llm_calls.inc(route, self.name)
+                metrics.llm_call_seconds.observe(time.perf_counter() - started, route, self.name)
+            reservation["actual_tokens"] = sum(
+                sum((run.metrics or {}).get(key) or []) for key in ("input_tokens", "output_tokens")
+            ) or None
+        self._record_token_usage(route, run.metrics)
+        output_budget.observe(operation, self._completion_tokens(run), detail)
+        return run.content
+
+    @staticmethod
+    def _upstream_error(error: Exception) -> Exception:
+        """Turn a provider 429 into UpstreamBusy so callers can answer with Retry-After"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is None:
+            return error
+        busy = upstream_limiter.rate_limited_upstream(retry_after)
+        busy.__cause__ = error
+        return busy
+
+    @staticmethod
+    def _completion_tokens(run: RunResponse) -> int:
+        reported = sum((run.metrics or {}).get("output_tokens") or [])
+        return reported or estimate_tokens(run.content or "")
+
+    def _cached_response(self, cache_key: str):
+        cached = response_cache.get(cache_key)
+        result = "miss" if cached is None else "hit"
+        metrics.cache_lookups.inc(current_route.get(), self.name, result)
+        return cached
+
+    def _record_token_usage(self, route: str, run_metrics: Dict[str, Any]):
+        if not run_metrics:
+            return
+        for kind, key in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+            tokens = sum(run_metrics.get(key) or [])
+            if tokens:
+                metrics.llm_tokens.inc(route, self.name, kind, amount=tokens)
+
+    async def astream_response(self, query, use_cache=True, operation=None):
+        """Yield response content chunks as the model generates them"""
+        prompt, model_id, max_tokens, detail = self._plan_call(query, operation)
+        cache_key = self._cache_key(prompt, model_id, max_tokens)
+        if use_cache:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        route = current_route.get()
+        chunks = []
+        async with upstream_limiter.slot(model_id, estimate_tokens(prompt) + max_tokens) as reservation:
+            metrics.llm_model_calls.inc(self.name, operation or "unspecified", model_id)
+            started = time.perf_counter()
+            try:
+                # The deadline only covers waits on the model, never a yield to the client, so
+                # chunks already sent stay with the client when it cuts the stream short
+                async with deadline_scope():
+                    events = (await self._agent_for(model_id, max_tokens).arun(prompt, stream=True)).__aiter__()
+                while True:
+                    async with deadline_scope():
+                        event = await anext(events, None)
+                    if event is None:
+                        break
+                    if event.event == RunEvent.run_error.value:
+                        raise RuntimeError(event.content)
+                    if event.event == RunEvent.run_response_content.value and event.content:
+                        chunks.append(event.content)
+                        yield event.content
+            except Exception as e:
+                metrics.llm_errors.inc(route, self.name, type(e).__name__)
+                raise self._upstream_error(e)
+            finally:
+                metrics.llm_calls.inc(route, self.name)
+                metrics.llm_call_seconds.observe(time.perf_counter() - started, route, self.name)
+            reservation["actual_tokens"] = estimate_tokens(prompt) + estimate_tokens("".join(chunks))
+
+        content = "".join(chunks)
+        # Streamed runs carry no usage metrics, so estimate the completion length
+        output_budget.observe(operation, estimate_tokens(content), detail)
+        if use_cache:
+            response_cache.set(cache_key, content, self.cache_ttl)
+
+    def _cache_key(self, query: str, model_id: str, max_tokens: int = None) -> str:
+        return response_cache.make_key(self.name, f"{model_id}:{max_tokens}", query)
+
     def get_contextual_response(self, query: str, context: Dict[str, Any] = None, 
                                user_id: str = None, personalization_level: str = "medium"):
         """Generate context-aware, personalized responses"""
+        enhanced_query = self._build_contextual_query(query, context, user_id, personalization_level)
+        return self.get_response(enhanced_query)
+
+    async def aget_contextual_response(self, query: str, context: Dict[str, Any] = None, 
+                                      user_id: str = None, personalization_level: str = "medium",
+                                      use_cache: bool = True):
+        """Async variant of get_contextual_response"""
+        enhanced_query = self._build_contextual_query(query, context, user_id, personalization_level)
+        return await self.aget_response(enhanced_query, use_cache=use_cache)
+
+    def _build_contextual_query(self, query: str, context: Dict[str, Any], 
+                                user_id: str, personalization_level: str) -> str:
+        """Wrap a query with the user's personalization context"""
         
         # Build context string
         context_str = self._build_context_string(context, user_id)
@@ -46,18 +235,42 @@ class BaseAgent:
         Personalization Level: {personalization_level}
         """
         
-        return self.get_response(enhanced_query)
+        return enhanced_query
     
     def _build_context_string(self, context: Dict[str, Any], user_id: str) -> str:
-        """Build context string for personalization"""
-        if not context:
-            context = {}
-            
-        # Add stored context if user_id exists
-        if user_id and user_id in self.context_memory:
-            stored_context = self.context_memory[user_id]
-            context.update(stored_context)
+        """Build context string for personalization without touching the caller's dict"""
+        stored_context = self.context_memory.get(user_id) if user_id else None
+        if stored_context and not context:
+            return self._render_stored_context(user_id, stored_context, "summary", self._render_context)
         
+        # Stored context wins over what the caller passed, as before
+        return self._render_context({**(context or {}), **(stored_context or {})})
+
+    def _render_stored_context(self, user_id: str, stored_context: Dict[str, Any], kind: str,
+                               render: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Render a user's stored context once per update and reuse the text.
+
+        Renderings are keyed by the context's last_updated stamp, so an update
+        from any worker invalidates them; store_context also drops them eagerly.
+        """
+        key = (user_id, kind)
+        version = stored_context.get('last_updated')
+        with self._context_renders_lock:
+            entry = self._context_renders.get(key)
+            if entry is not None and entry[0] == version:
+                self._context_renders.move_to_end(key)
+                return entry[1]
+        
+        rendered = render(stored_context)
+        with self._context_renders_lock:
+            self._context_renders[key] = (version, rendered)
+            self._context_renders.move_to_end(key)
+            while len(self._context_renders) > self.context_render_cache_size:
+                self._context_renders.popitem(last=False)
+        return rendered
+
+    def _render_context(self, context: Dict[str, Any]) -> str:
         context_parts = []
         
         # Personal info
@@ -93,10 +306,19 @@ class BaseAgent:
     
     def store_context(self, user_id: str, context: Dict[str, Any]):
         """Store user context for future personalization"""
-        if user_id not in self.context_memory:
-            self.context_memory[user_id] = {}
-        self.context_memory[user_id].update(context)
-        self.context_memory[user_id]['last_updated'] = datetime.now().isoformat()
+        self.context_memory.update(user_id, context)
+        self._forget_context_renders(user_id)
+
+    def modify_context(self, user_id: str, change) -> Dict[str, Any]:
+        """Atomically rewrite a user's stored context with change(current) and return the result"""
+        context = self.context_memory.modify(user_id, change)
+        self._forget_context_renders(user_id)
+        return context
+
+    def _forget_context_renders(self, user_id: str):
+        with self._context_renders_lock:
+            for key in [key for key in self._context_renders if key[0] == user_id]:
+                del self._context_renders[key]
 
     def print_response(self, query, stream=True):
         """Print response directly to terminal"""
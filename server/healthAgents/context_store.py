@@ -0,0 +1,345 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default directory for persistent data such as the user context database
+DATA_DIR = os.getenv(
+    "HEALTH_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+# How long a request thread waits on another worker's write lock before deferring to the writer thread
+BUSY_TIMEOUT = float(os.getenv("CONTEXT_DB_BUSY_TIMEOUT_MS", "10")) / 1000
+# How long the background writer thread waits for the lock
+WRITER_BUSY_TIMEOUT = 5.0
+
+
+class ContextStore:
+    """
+    Bounded per-user context store.
+
+    Entries are evicted least-recently-used once either the user count or the
+    approximate serialized size passes its limit, and expire ttl seconds after
+    their last_updated timestamp. With max_age set, entries are also treated as
+    missing that long after they were stored, which bounds staleness when the
+    store caches a shared backend.
+    """
+
+    def __init__(self, max_users: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 30 * 24 * 3600, max_age: float = 0):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_age = max_age
+        # user_id -> (context, size in bytes, last_updated as a unix timestamp, stored_at monotonic)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return a copy of the user's context, or default if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and self._expired(entry):
+                self._remove(user_id)
+                self.expirations += 1
+                entry = None
+            elif entry is not None and self.max_age > 0 and entry[3] + self.max_age <= time.monotonic():
+                self._remove(user_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[0])
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def update(self, user_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge context into the user's entry and stamp last_updated"""
+        return self.modify(user_id, lambda current: {**current, **context})
+
+    def modify(self, user_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """Atomically replace the user's entry with change(current entry) and stamp last_updated"""
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            changed = change(dict(entry[0]) if entry is not None and not self._expired(entry) else {})
+            changed['last_updated'] = now.isoformat()
+            self._put(user_id, changed, now.timestamp())
+            return dict(changed)
+
+    def set(self, user_id: str, context: Dict[str, Any]):
+        """Replace the user's entry as-is, keeping its own last_updated when present"""
+        with self._lock:
+            self._put(user_id, dict(context), self._timestamp(context))
+
+    def delete(self, user_id: str):
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _put(self, user_id: str, context: Dict[str, Any], updated_at: float):
+        if user_id in self._entries:
+            self._remove(user_id)
+        size = len(json.dumps(context, default=str))
+        self._entries[user_id] = (context, size, updated_at, time.monotonic())
+        self.total_bytes += size
+        while self._entries and (len(self._entries) > self.max_users or self.total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, user_id: str):
+        size = self._entries.pop(user_id)[1]
+        self.total_bytes -= size
+
+    def _expired(self, entry: tuple) -> bool:
+        return self.ttl > 0 and entry[2] + self.ttl <= time.time()
+
+    @staticmethod
+    def _timestamp(context: Dict[str, Any]) -> float:
+        try:
+            return datetime.fromisoformat(context['last_updated']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return time.time()
+
+
+class SQLiteContextStore:
+    """
+    Persistent user context shared by every worker process through one SQLite file.
+
+    The database runs in WAL mode so readers never block the writer. Writes go
+    straight to disk (write-through) and refresh a bounded in-process hot cache;
+    reads are served from that cache for up to its max_age seconds, which is
+    how stale another worker's update can look before it is picked up.
+
+    Calls come from the event loop, so a request thread only waits busy_timeout
+    for another worker's write lock. A write that can't get it in time is
+    applied to the hot cache and handed to a single background writer thread,
+    which retries it with a longer timeout; purges of expired rows run there too.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl: float = 30 * 24 * 3600,
+                 cache: Optional[ContextStore] = None, busy_timeout: float = BUSY_TIMEOUT):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.cache = cache if cache is not None else ContextStore(ttl=ttl, max_age=2.0)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"context-writer-{namespace}",
+                                          initializer=self._init_writer)
+        self._writes = 0
+        self.deferred_writes = 0
+        self.busy_reads = 0
+        self._writer.submit(self._create_table).result()
+
+    def _create_table(self):
+        self._connection().execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_context (
+                namespace TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                context TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, user_id)
+            )
+            """
+        )
+
+    def _init_writer(self):
+        self._local.writer = True
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            timeout = WRITER_BUSY_TIMEOUT if getattr(self._local, "writer", False) else self.busy_timeout
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _is_busy(error: sqlite3.OperationalError) -> bool:
+        return "locked" in str(error) or "busy" in str(error)
+
+    def _defer(self, operation: Callable[[], Any], description: str):
+        """Run a write on the background writer thread, logging rather than raising its failure"""
+        self.deferred_writes += 1
+
+        def run():
+            try:
+                operation()
+            except sqlite3.Error as e:
+                logger.warning("Deferred %s of user context in %s failed: %s", description, self.path, e)
+
+        self._writer.submit(run)
+
+    def get(self, user_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
+        try:
+            row = self._connection().execute(
+                "SELECT context, updated_at FROM user_context WHERE namespace = ? AND user_id = ?",
+                (self.namespace, user_id),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            if not self._is_busy(e):
+                raise
+            self.busy_reads += 1
+            return default
+        if row is None or (self.ttl > 0 and row[1] + self.ttl <= time.time()):
+            return default
+        context = json.loads(row[0])
+        self.cache.set(user_id, context)
+        return dict(context)
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def update(self, user_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge context into the stored entry atomically across processes"""
+        return self.modify(user_id, lambda current: {**current, **context})
+
+    def modify(self, user_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Replace the stored entry with change(current entry) atomically across
+        processes. If another worker holds the write lock past busy_timeout,
+        the result of change on the cached entry is returned and cached, and
+        the change is re-applied to the stored entry by the writer thread.
+        """
+        try:
+            merged = self._modify(user_id, change)
+        except sqlite3.OperationalError as e:
+            if not self._is_busy(e):
+                raise
+            merged = change(self.get(user_id) or {})
+            merged['last_updated'] = datetime.now().isoformat()
+            self.cache.set(user_id, merged)
+            self._defer(lambda: self._modify(user_id, change), "write")
+            return dict(merged)
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._defer(self.purge_expired, "purge")
+        return dict(merged)
+
+    def _modify(self, user_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        now = datetime.now()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT context, updated_at FROM user_context WHERE namespace = ? AND user_id = ?",
+                (self.namespace, user_id),
+            ).fetchone()
+            fresh = row is not None and not (self.ttl > 0 and row[1] + self.ttl <= time.time())
+            merged = change(json.loads(row[0]) if fresh else {})
+            merged['last_updated'] = now.isoformat()
+            conn.execute(
+                """
+                INSERT INTO user_context (namespace, user_id, context, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, user_id) DO UPDATE SET
+                    context = excluded.context, updated_at = excluded.updated_at
+                """,
+                (self.namespace, user_id, json.dumps(merged, default=str), now.timestamp()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.cache.set(user_id, merged)
+        return merged
+
+    def delete(self, user_id: str):
+        self.cache.delete(user_id)
+        try:
+            self._delete(user_id)
+        except sqlite3.OperationalError as e:
+            if not self._is_busy(e):
+                raise
+            self._defer(lambda: self._delete(user_id), "delete")
+
+    def _delete(self, user_id: str):
+        self._connection().execute(
+            "DELETE FROM user_context WHERE namespace = ? AND user_id = ?", (self.namespace, user_id)
+        )
+
+    def purge_expired(self):
+        if self.ttl > 0:
+            self._connection().execute(
+                "DELETE FROM user_context WHERE namespace = ? AND updated_at < ?",
+                (self.namespace, time.time() - self.ttl),
+            )
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM user_context WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, "stored_users": len(self),
+                "deferred_writes": self.deferred_writes, "busy_reads": self.busy_reads,
+                "cache": self.cache.stats()}
+
+
+def create_context_store(namespace: str = "default"):
+    """
+    Build the user context store selected by CONTEXT_STORE.
+
+    "sqlite" (the default) persists to CONTEXT_DB_PATH, resolved against
+    HEALTH_DATA_DIR when relative, and is shared by every worker; "memory"
+    keeps a bounded per-process store. If the database can't be opened (e.g. a
+    read-only filesystem) the in-memory store is used instead.
+    """
+    ttl = float(os.getenv("CONTEXT_TTL_SECONDS", str(30 * 24 * 3600)))
+    memory_store = ContextStore(
+        max_users=int(os.getenv("CONTEXT_MAX_USERS", "10000")),
+        max_bytes=int(os.getenv("CONTEXT_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=ttl,
+    )
+    if os.getenv("CONTEXT_STORE", "sqlite").lower() != "sqlite":
+        return memory_store
+
+    path = os.path.join(DATA_DIR, os.getenv("CONTEXT_DB_PATH", "user_context.sqlite3"))
+    memory_store.max_age = float(os.getenv("CONTEXT_CACHE_MAX_AGE", "2"))
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteContextStore(path, namespace, ttl=ttl, cache=memory_store)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Falling back to in-memory user context, can't open %s: %s", path, e)
+        memory_store.max_age = 0
+        return memory_store
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .request_context import request_deadline
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the model finished"""
+
+    def __init__(self, message: str = "The request deadline passed before the model finished"):
+        super().__init__(message)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None when it has none"""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline():
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded()
+
+
+@asynccontextmanager
+async def deadline_scope():
+    """Cancel the enclosed work when the request's deadline passes, raising DeadlineExceeded"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        yield
+        return
+    check_deadline()
+    try:
+        # The event loop clock is time.monotonic(), the clock deadlines are set on
+        async with asyncio.timeout_at(deadline):
+            yield
+    except TimeoutError:
+        raise DeadlineExceeded() from None
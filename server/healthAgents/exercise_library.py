@@ -0,0 +1,272 @@
+import difflib
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from .shopping_list import normalize_name
+
+EXERCISE_LIBRARY_PATH = os.getenv(
+    "EXERCISE_LIBRARY_PATH", os.path.join(os.path.dirname(__file__), "data", "exercises.json")
+)
+# Fuzzy name matches below this similarity go to the model instead
+MIN_MATCH_SCORE = 0.85
+# Fuzzy matching only scores this many names sharing the most trigrams with the query
+FUZZY_CANDIDATES = 8
+MAX_ALTERNATIVES = 5
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+
+# Phrase in a free-text equipment description -> equipment it makes available.
+# Exercises listing no equipment are bodyweight and always available.
+EQUIPMENT_PHRASES = {
+    "barbell": {"barbell"}, "barbells": {"barbell"},
+    "rack": {"squat rack"}, "squat rack": {"squat rack"}, "power rack": {"squat rack"},
+    "dumbbell": {"dumbbell"}, "dumbbells": {"dumbbell"},
+    "kettlebell": {"kettlebell"}, "kettlebells": {"kettlebell"},
+    "free weights": {"barbell", "dumbbell", "kettlebell"}, "weights": {"dumbbell"},
+    "bench": {"bench"}, "box": {"bench"}, "step": {"bench"}, "chair": {"bench"},
+    "band": {"resistance band"}, "bands": {"resistance band"}, "resistance band": {"resistance band"},
+    "resistance bands": {"resistance band"},
+    "pull-up bar": {"pull-up bar"}, "pullup bar": {"pull-up bar"}, "pull up bar": {"pull-up bar"},
+    "chin-up bar": {"pull-up bar"}, "chin up bar": {"pull-up bar"},
+    "cable": {"cable machine"}, "cables": {"cable machine"}, "cable machine": {"cable machine"},
+    "leg press": {"leg press machine"}, "machines": {"cable machine", "leg press machine"},
+    "dip station": {"dip station"}, "dip bars": {"dip station"}, "parallel bars": {"dip station"},
+    "bodyweight": set(), "body weight": set(), "minimal": set(), "none": set(), "nothing": set(),
+    "no equipment": set(),
+}
+# Phrases that mean every piece of equipment in the library is available
+FULL_GYM_PHRASES = {"gym", "full gym", "commercial gym", "everything", "any", "all"}
+# Words that can surround equipment without changing it
+FILLER_WORDS = {"a", "an", "and", "or", "the", "i", "have", "only", "just", "some", "with", "to", "access",
+                "equipment", "my", "at", "in", "plus", "of", "pair", "set", "available", "use", "can"}
+
+# Free-text difficulty -> level index, or a step relative to the original exercise
+DIFFICULTY_WORDS = {
+    "beginner": 0, "novice": 0, "easy": 0, "basic": 0,
+    "intermediate": 1, "moderate": 1, "medium": 1,
+    "advanced": 2, "hard": 2, "expert": 2, "challenging": 2,
+    "easier": "easier", "simpler": "easier", "regression": "easier",
+    "harder": "harder", "progression": "harder", "tougher": "harder",
+}
+DIFFICULTY_FILLER = {"a", "bit", "level", "more", "slightly", "much"}
+
+_EQUIPMENT_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(set(EQUIPMENT_PHRASES) | FULL_GYM_PHRASES,
+                                                     key=len, reverse=True)) + r")\b"
+)
+
+
+def name_key(name: str) -> str:
+    """Exercise name as used for lookups: normalized, with hyphens read as spaces"""
+    return normalize_name(name).replace("-", " ")
+
+
+def parse_equipment(text: Optional[str], everything: FrozenSet[str]) -> Optional[FrozenSet[str]]:
+    """
+    Equipment available according to a free-text description, or None when
+    part of it isn't understood. No description means no restriction.
+    """
+    text = str(text or "").lower()
+    if not text.strip():
+        return everything
+    available = set()
+    for phrase in _EQUIPMENT_PATTERN.findall(text):
+        if phrase in FULL_GYM_PHRASES:
+            return everything
+        available |= EQUIPMENT_PHRASES[phrase]
+    leftover = set(re.findall(r"[a-z'-]+", _EQUIPMENT_PATTERN.sub(" ", text))) - FILLER_WORDS
+    return None if leftover else frozenset(available)
+
+
+def parse_difficulty(text: Optional[str], original: str) -> Optional[FrozenSet[str]]:
+    """Difficulty levels allowed by a free-text difficulty, or None when it isn't understood"""
+    words = re.findall(r"[a-z]+", str(text or "").lower())
+    if not words:
+        return frozenset(DIFFICULTY_LEVELS)
+    steps = {DIFFICULTY_WORDS[word] for word in words if word in DIFFICULTY_WORDS}
+    if len(steps) != 1 or set(words) - set(DIFFICULTY_WORDS) - DIFFICULTY_FILLER:
+        return None
+    step = steps.pop()
+    base = DIFFICULTY_LEVELS.index(original)
+    if step == "easier":
+        levels = DIFFICULTY_LEVELS[:max(base, 1)]
+    elif step == "harder":
+        levels = DIFFICULTY_LEVELS[min(base + 1, len(DIFFICULTY_LEVELS) - 1):]
+    else:
+        # A stated level also allows easier exercises
+        levels = DIFFICULTY_LEVELS[:step + 1]
+    return frozenset(levels)
+
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ExerciseLibrary:
+    """
+    Catalogue of common exercises with inverted indexes over its fields.
+
+    Each exercise has primary and secondary muscles, required equipment, a
+    difficulty level, a movement pattern and form cues. Indexes map each
+    pattern, primary muscle, piece of equipment and difficulty to the set of
+    exercise ids, so alternatives are a few set unions and intersections.
+    Names resolve through an alias dictionary, then a character-trigram
+    index that shortlists candidates for fuzzy matching. Form guides are
+    rendered once at load.
+    """
+
+    def __init__(self, exercises: List[Dict[str, Any]]):
+        self.exercises = exercises
+        self.aliases: Dict[str, int] = {}
+        self.by_pattern: Dict[str, FrozenSet[int]] = {}
+        self.by_muscle: Dict[str, FrozenSet[int]] = {}
+        self.by_equipment: Dict[str, FrozenSet[int]] = {}
+        self.by_difficulty: Dict[str, FrozenSet[int]] = {}
+        indexes = {"pattern": {}, "muscle": {}, "equipment": {}, "difficulty": {}}
+        for index, exercise in enumerate(exercises):
+            for alias in [exercise["name"]] + exercise.get("aliases", []):
+                self.aliases.setdefault(name_key(alias), index)
+            indexes["pattern"].setdefault(exercise["pattern"], set()).add(index)
+            indexes["difficulty"].setdefault(exercise["difficulty"], set()).add(index)
+            for muscle in exercise["primary_muscles"]:
+                indexes["muscle"].setdefault(muscle, set()).add(index)
+            for item in exercise["equipment"]:
+                indexes["equipment"].setdefault(item, set()).add(index)
+        for field, index in indexes.items():
+            setattr(self, f"by_{field}", {value: frozenset(ids) for value, ids in index.items()})
+        self.everything = frozenset(self.by_equipment)
+        self._trigram_index: Dict[str, List[str]] = {}
+        for key in self.aliases:
+            for trigram in _trigrams(key):
+                self._trigram_index.setdefault(trigram, []).append(key)
+        self.guides = [render_form_guide(exercise) for exercise in exercises]
+
+    @classmethod
+    def load(cls, path: str = EXERCISE_LIBRARY_PATH) -> "ExerciseLibrary":
+        with open(path, encoding="utf-8") as f:
+            exercises = json.load(f)
+        for exercise in exercises:
+            if exercise["difficulty"] not in DIFFICULTY_LEVELS:
+                raise ValueError(f"{exercise['name']}: unknown difficulty {exercise['difficulty']!r}")
+        return cls(exercises)
+
+    def match(self, exercise: str) -> Tuple[Optional[int], float]:
+        """(exercise id, similarity) of the closest known exercise; similarity 1.0 for an exact alias"""
+        key = name_key(exercise)
+        if key in self.aliases:
+            return self.aliases[key], 1.0
+        shared = Counter(candidate for trigram in _trigrams(key)
+                         for candidate in self._trigram_index.get(trigram, ()))
+        shortlist = [candidate for candidate, _ in shared.most_common(FUZZY_CANDIDATES)]
+        best, score = None, 0.0
+        for candidate in difflib.get_close_matches(key, shortlist, n=1, cutoff=MIN_MATCH_SCORE):
+            best, score = self.aliases[candidate], difflib.SequenceMatcher(None, key, candidate).ratio()
+        return best, score
+
+    def alternatives(self, exercise: str, equipment: Optional[str] = None,
+                     difficulty: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Exercises that train the same pattern or primary muscles with the
+        available equipment and difficulty, best matches first; None when the
+        library can't answer confidently.
+        """
+        index, score = self.match(exercise)
+        if index is None:
+            return None
+        original = self.exercises[index]
+        available = parse_equipment(equipment, self.everything)
+        levels = parse_difficulty(difficulty, original["difficulty"])
+        if available is None or levels is None:
+            return None
+
+        similar = set(self.by_pattern[original["pattern"]])
+        for muscle in original["primary_muscles"]:
+            similar |= self.by_muscle.get(muscle, frozenset())
+        allowed = set()
+        for level in levels:
+            allowed |= self.by_difficulty.get(level, frozenset())
+        candidates = similar & allowed
+        for item in self.everything - available:
+            candidates -= self.by_equipment[item]
+        candidates.discard(index)
+        if not candidates:
+            return None
+
+        muscles = set(original["primary_muscles"])
+        worked = muscles | set(original["secondary_muscles"])
+        base = DIFFICULTY_LEVELS.index(original["difficulty"])
+
+        def rank(candidate: int):
+            other = self.exercises[candidate]
+            return (other["pattern"] != original["pattern"],
+                    -len(muscles & set(other["primary_muscles"])),
+                    -len(worked & set(other["primary_muscles"] + other["secondary_muscles"])),
+                    abs(DIFFICULTY_LEVELS.index(other["difficulty"]) - base),
+                    other["name"])
+
+        return {
+            "exercise": original["name"],
+            "match_score": round(score, 2),
+            "alternatives": [self._summary(candidate, base)
+                             for candidate in sorted(candidates, key=rank)[:MAX_ALTERNATIVES]],
+        }
+
+    def form_guide(self, exercise: str) -> Optional[Dict[str, Any]]:
+        """Precomputed form guide for exercise, or None when it isn't in the library"""
+        index, score = self.match(exercise)
+        if index is None:
+            return None
+        return {"exercise": self.exercises[index]["name"], "match_score": round(score, 2),
+                "guide": self.guides[index]}
+
+    def _summary(self, index: int, base: int) -> Dict[str, Any]:
+        exercise = self.exercises[index]
+        level = DIFFICULTY_LEVELS.index(exercise["difficulty"])
+        return {
+            "name": exercise["name"],
+            "pattern": exercise["pattern"],
+            "primary_muscles": exercise["primary_muscles"],
+            "secondary_muscles": exercise["secondary_muscles"],
+            "equipment": exercise["equipment"],
+            "difficulty": exercise["difficulty"],
+            "relative_difficulty": "easier" if level < base else "harder" if level > base else "similar",
+            "form": f"{exercise['form']['setup']} {' '.join(exercise['form']['steps'][1:3])}",
+        }
+
+
+def render_form_guide(exercise: Dict[str, Any]) -> str:
+    form = exercise["form"]
+    lines = [f"# {exercise['name'].title()}: Form Guide", "", "## Starting Position", form["setup"],
+             "", "## Step by Step"]
+    lines += [f"{number}. {step}" for number, step in enumerate(form["steps"], 1)]
+    lines += ["", "## Breathing", form["breathing"], "", "## Common Mistakes to Avoid"]
+    lines += [f"- {mistake}" for mistake in form["mistakes"]]
+    lines += ["", "## How to Know You're Doing It Right"]
+    lines += [f"- {check}" for check in form["checks"]]
+    lines += ["", "## Modifications", f"- Easier: {form['easier']}", f"- Harder: {form['harder']}"]
+    return "\n".join(lines)
+
+
+RELATIVE_DIFFICULTY = {"easier": "easier than the original", "similar": "similar to the original",
+                       "harder": "harder than the original"}
+
+
+def render_alternatives(result: Dict[str, Any]) -> str:
+    lines = [f"Alternatives to {result['exercise']}:"]
+    for number, alternative in enumerate(result["alternatives"], 1):
+        equipment = ", ".join(alternative["equipment"]) or "bodyweight"
+        lines.append(f"\n{number}. **{alternative['name'].title()}** ({equipment}; {alternative['difficulty']}, "
+                     f"{RELATIVE_DIFFICULTY[alternative['relative_difficulty']]})")
+        lines.append(f"   - Form: {alternative['form']}")
+        muscles = f"   - Muscles: {', '.join(alternative['primary_muscles'])}"
+        if alternative["secondary_muscles"]:
+            muscles += f" (also {', '.join(alternative['secondary_muscles'])})"
+        lines.append(muscles)
+    return "\n".join(lines)
+
+
+exercise_library = ExerciseLibrary.load()
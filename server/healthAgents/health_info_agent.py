@@ -1,6 +1,9 @@
 from .base_agent import BaseAgent
 
 class HealthInfoAgent(BaseAgent):
+    # Educational answers rarely change, so keep them cached for a day
+    cache_ttl = 24 * 3600
+
     def __init__(self):
         super().__init__(
             name="HealthEducator",
@@ -18,7 +21,7 @@ class HealthInfoAgent(BaseAgent):
             "Chronic Disease Management"
         ]
 
-    def explain_health_concept(self, concept):
+    async def explain_health_concept(self, concept):
         """Provide a clear explanation of a health concept"""
         prompt = f"""
         Explain the health concept: "{concept}"
@@ -32,9 +35,9 @@ class HealthInfoAgent(BaseAgent):
         
         Use language that's accessible but scientifically accurate. Include relevant examples.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="explain_health_concept")
     
-    def answer_health_question(self, question):
+    async def answer_health_question(self, question):
         """Answer a specific health question with evidence-based information"""
         prompt = f"""
         Answer this health question: "{question}"
@@ -48,9 +51,9 @@ class HealthInfoAgent(BaseAgent):
         
         Be thorough but not overwhelming, and always emphasize consulting professionals for medical concerns.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="answer_health_question")
     
-    def debunk_health_myth(self, myth):
+    async def debunk_health_myth(self, myth):
         """Address and debunk common health myths with facts"""
         prompt = f"""
         Address this health myth: "{myth}"
@@ -64,9 +67,9 @@ class HealthInfoAgent(BaseAgent):
         
         Be respectful but clear about what the evidence supports.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="debunk_health_myth")
     
-    def provide_research_summary(self, research_topic):
+    async def provide_research_summary(self, research_topic):
         """Summarize current research on a health topic"""
         prompt = f"""
         Provide a research summary on: "{research_topic}"
@@ -80,11 +83,18 @@ class HealthInfoAgent(BaseAgent):
         
         Present information objectively and note any limitations or controversies.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="provide_research_summary")
     
-    def create_educational_content(self, topic, format_type="article"):
+    async def create_educational_content(self, topic, format_type="article"):
         """Create educational content on a health topic"""
-        prompt = f"""
+        return await self.aget_response(self._educational_content_prompt(topic, format_type), operation="create_educational_content")
+
+    def stream_educational_content(self, topic, format_type="article"):
+        """Stream educational content as it is generated"""
+        return self.astream_response(self._educational_content_prompt(topic, format_type), operation="create_educational_content")
+
+    def _educational_content_prompt(self, topic, format_type):
+        return f"""
         Create educational content about "{topic}" in {format_type} format.
         
         Structure the content with:
@@ -96,9 +106,8 @@ class HealthInfoAgent(BaseAgent):
         
         Make it informative, engaging, and actionable for a general audience.
         """
-        return self.get_response(prompt)
     
-    def compare_health_approaches(self, approach1, approach2, goal):
+    async def compare_health_approaches(self, approach1, approach2, goal):
         """Compare different health approaches for a specific goal"""
         prompt = f"""
         Compare "{approach1}" vs "{approach2}" for the goal of "{goal}".
@@ -113,4 +122,4 @@ class HealthInfoAgent(BaseAgent):
         
         Be balanced and acknowledge that individual needs vary.
         """
-        return self.get_response(prompt) 
\ No newline at end of file
+        return await self.aget_response(prompt, operation="compare_health_approaches") 
\ No newline at end of file
@@ -1,49 +1,105 @@
 from .base_agent import BaseAgent
+from .history import create_rolling_history
+from .prompt_compaction import (compact_context, compact_prompt, estimate_tokens, record_compaction,
+                                render_sections, render_sections_verbose)
 from typing import Dict, Any, List
 import json
 
+ASSESSMENT_SECTIONS = (
+    ("PERSONAL DATA", (
+        ("Age", "age", "Not provided"),
+        ("Height", "height", "Not provided"),
+        ("Weight", "weight", "Not provided"),
+        ("Gender", "gender", "Not provided"),
+    )),
+    ("LIFESTYLE", (
+        ("Activity Level", "activity_level", "Not provided"),
+        ("Sleep Quality", "sleep_quality", "Not provided"),
+        ("Stress Level", "stress_level", "Not provided"),
+        ("Work Type", "work_type", "Not provided"),
+    )),
+    ("HEALTH STATUS", (
+        ("Medical Conditions", "medical_conditions", "None mentioned"),
+        ("Medications", "medications", "None mentioned"),
+        ("Injuries", "injuries", "None mentioned"),
+        ("Energy Levels", "energy_levels", "Not provided"),
+    )),
+    ("GOALS & PREFERENCES", (
+        ("Primary Goals", "goals", "Not specified"),
+        ("Secondary Goals", "secondary_goals", "Not specified"),
+        ("Preferred Activities", "preferred_activities", "Not specified"),
+        ("Dietary Preferences", "dietary_preferences", "Not specified"),
+        ("Time Availability", "time_availability", "Not specified"),
+    )),
+)
+
+PROGRAM_SECTIONS = (
+    ("USER PROFILE", (
+        ("Current Health Status", "health_status", "Unknown"),
+        ("Fitness Level", "fitness_level", "Unknown"),
+        ("Available Time", "available_time", "Unknown"),
+        ("Equipment Access", "equipment", "Unknown"),
+        ("Budget Constraints", "budget", "Unknown"),
+    )),
+    ("GOALS & MOTIVATION", (
+        ("Primary Goal", "primary_goal", "Unknown"),
+        ("Motivation Level", "motivation_level", "Unknown"),
+        ("Preferred Learning Style", "learning_style", "Unknown"),
+    )),
+    ("CONSTRAINTS", (
+        ("Physical Limitations", "limitations", "None"),
+        ("Schedule Constraints", "schedule", "Flexible"),
+        ("Social Preferences", "social_preference", "Unknown"),
+    )),
+    ("HEALTH ASSESSMENT", (
+        ("Assessment", "health_assessment", "Not available"),
+    )),
+)
+
 
 class HealthProfileAgent(BaseAgent):
+    # Greetings and suggestions are personal and time-sensitive
+    cache_ttl = 10 * 60
+
     def __init__(self):
         super().__init__(
             name="HealthProfiler",
             description="I'm your personal health profile assistant. I analyze your unique situation and provide tailored wellness guidance.",
             avatar="health_avatar.png"
         )
-        
-        # Ensure context_memory is available
-        if not hasattr(self, 'context_memory'):
-            self.context_memory = {}
-    
-    def store_context(self, user_id: str, context: Dict[str, Any]):
-        """Store user context for future personalization (fallback implementation)"""
-        if not hasattr(self, 'context_memory'):
-            self.context_memory = {}
-        
-        if user_id not in self.context_memory:
-            self.context_memory[user_id] = {}
-        
-        self.context_memory[user_id].update(context)
-        from datetime import datetime
-        self.context_memory[user_id]['last_updated'] = datetime.now().isoformat()
+        self.history = create_rolling_history(self)
     
     def get_contextual_response(self, query: str, context: Dict[str, Any] = None, 
                                user_id: str = None, personalization_level: str = "medium"):
         """Generate context-aware, personalized responses (fallback implementation)"""
-        
-        # Simple fallback - just use the regular response with some context
+        return self.get_response(self._build_fallback_query(query, context, user_id))
+
+    async def aget_contextual_response(self, query: str, context: Dict[str, Any] = None, 
+                                      user_id: str = None, personalization_level: str = "medium",
+                                      use_cache: bool = True):
+        """Async variant of get_contextual_response (fallback implementation)"""
+        return await self.aget_response(self._build_fallback_query(query, context, user_id), use_cache=use_cache)
+
+    def _build_fallback_query(self, query: str, context: Dict[str, Any] = None, user_id: str = None) -> str:
+        """Simple fallback - just use the regular query with some context"""
+        context_str = None
         if context:
-            context_str = ", ".join([f"{k}: {v}" for k, v in context.items() if v])
-            enhanced_query = f"""
+            context_str = self._render_fallback_context(context)
+        elif user_id:
+            stored_context = self.context_memory.get(user_id)
+            if stored_context:
+                context_str = self._render_stored_context(
+                    user_id, stored_context, "fallback", self._render_fallback_context
+                )
+        if context_str:
+            return f"""
             User Context: {context_str}
             
             Query: {query}
             
             Please provide a personalized response considering the user's context.
             """
-            return self.get_response(enhanced_query)
-        else:
-            return self.get_response(query)
+        return query
         
         self.health_goals = [
             "Weight management", "Muscle building", "Cardiovascular health",
@@ -58,7 +114,11 @@ class HealthProfileAgent(BaseAgent):
             "busy_professional": "Someone with limited time but high motivation"
         }
 
-    def dynamic_greeting(self, user_context: Dict[str, Any]) -> str:
+    @staticmethod
+    def _render_fallback_context(context: Dict[str, Any]) -> str:
+        return ", ".join([f"{k}: {v}" for k, v in context.items() if v])
+
+    async def dynamic_greeting(self, user_context: Dict[str, Any]) -> str:
         """Generate dynamic, personalized greeting based on comprehensive user context"""
         
         # Analyze user context to determine greeting style
@@ -86,38 +146,36 @@ class HealthProfileAgent(BaseAgent):
         Keep it concise but meaningful (2-3 sentences).
         """
         
-        return self.get_response(context_prompt)
+        return await self.aget_response(context_prompt, operation="dynamic_greeting")
 
-    def intelligent_assessment(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def intelligent_assessment(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create an intelligent, multi-dimensional health assessment"""
         
-        assessment_prompt = f"""
+        # Assessments are personal and stored as context, so never serve them from cache
+        response = await self.aget_response(self._assessment_prompt(user_data), use_cache=False, operation="intelligent_assessment")
+        user_id = self._remember_assessment(user_data)
+        
+        return {"assessment": response, "user_id": user_id}
+
+    async def stream_intelligent_assessment(self, user_data: Dict[str, Any]):
+        """Stream the health assessment as it is generated, then store the user's context"""
+        async for chunk in self.astream_response(self._assessment_prompt(user_data), use_cache=False, operation="intelligent_assessment"):
+            yield chunk
+        self._remember_assessment(user_data)
+
+    def _assessment_prompt(self, user_data: Dict[str, Any]) -> str:
+        return self._compacted_prompt(
+            "intelligent_assessment", self._assessment_template,
+            render_sections(ASSESSMENT_SECTIONS, user_data, "intelligent_assessment"),
+            estimate_tokens(render_sections_verbose(ASSESSMENT_SECTIONS, user_data)),
+        )
+
+    @staticmethod
+    def _assessment_template(user_details: str) -> str:
+        return f"""
         Based on this comprehensive user data, create a detailed health assessment:
         
-        PERSONAL DATA:
-        Age: {user_data.get('age', 'Not provided')}
-        Height: {user_data.get('height', 'Not provided')}
-        Weight: {user_data.get('weight', 'Not provided')}
-        Gender: {user_data.get('gender', 'Not provided')}
-        
-        LIFESTYLE:
-        Activity Level: {user_data.get('activity_level', 'Not provided')}
-        Sleep Quality: {user_data.get('sleep_quality', 'Not provided')}
-        Stress Level: {user_data.get('stress_level', 'Not provided')}
-        Work Type: {user_data.get('work_type', 'Not provided')}
-        
-        HEALTH STATUS:
-        Medical Conditions: {user_data.get('medical_conditions', 'None mentioned')}
-        Medications: {user_data.get('medications', 'None mentioned')}
-        Injuries: {user_data.get('injuries', 'None mentioned')}
-        Energy Levels: {user_data.get('energy_levels', 'Not provided')}
-        
-        GOALS & PREFERENCES:
-        Primary Goals: {user_data.get('goals', 'Not specified')}
-        Secondary Goals: {user_data.get('secondary_goals', 'Not specified')}
-        Preferred Activities: {user_data.get('preferred_activities', 'Not specified')}
-        Dietary Preferences: {user_data.get('dietary_preferences', 'Not specified')}
-        Time Availability: {user_data.get('time_availability', 'Not specified')}
+        {user_details}
         
         Provide a comprehensive assessment with:
         1. Health Status Summary (current state analysis)
@@ -130,10 +188,9 @@ class HealthProfileAgent(BaseAgent):
         
         Format as JSON with clear sections and actionable insights.
         """
-        
-        response = self.get_response(assessment_prompt)
-        
-        # Store context for future personalization
+
+    def _remember_assessment(self, user_data: Dict[str, Any]):
+        """Store context for future personalization"""
         user_id = user_data.get('user_id')
         if user_id:
             self.store_context(user_id, {
@@ -142,31 +199,25 @@ class HealthProfileAgent(BaseAgent):
                 'goals': user_data.get('goals'),
                 'preferences': user_data.get('preferences')
             })
-        
-        return {"assessment": response, "user_id": user_id}
+        return user_id
 
-    def adaptive_program_suggestion(self, user_context: Dict[str, Any]) -> str:
+    async def adaptive_program_suggestion(self, user_context: Dict[str, Any]) -> str:
         """Suggest programs that adapt to user's changing needs"""
         
-        suggestion_prompt = f"""
-        Based on this user's comprehensive profile, suggest the most suitable wellness programs:
-        
-        USER PROFILE:
-        Current Health Status: {user_context.get('health_status', 'Unknown')}
-        Fitness Level: {user_context.get('fitness_level', 'Unknown')}
-        Available Time: {user_context.get('available_time', 'Unknown')}
-        Equipment Access: {user_context.get('equipment', 'Unknown')}
-        Budget Constraints: {user_context.get('budget', 'Unknown')}
+        suggestion_prompt = self._compacted_prompt(
+            "adaptive_program", self._program_template,
+            render_sections(PROGRAM_SECTIONS, user_context, "adaptive_program"),
+            estimate_tokens(render_sections_verbose(PROGRAM_SECTIONS, user_context)),
+        )
         
-        GOALS & MOTIVATION:
-        Primary Goal: {user_context.get('primary_goal', 'Unknown')}
-        Motivation Level: {user_context.get('motivation_level', 'Unknown')}
-        Preferred Learning Style: {user_context.get('learning_style', 'Unknown')}
+        return await self.aget_response(suggestion_prompt, operation="adaptive_program_suggestion")
+
+    @staticmethod
+    def _program_template(user_profile: str) -> str:
+        return f"""
+        Based on this user's comprehensive profile, suggest the most suitable wellness programs:
         
-        CONSTRAINTS:
-        Physical Limitations: {user_context.get('limitations', 'None')}
-        Schedule Constraints: {user_context.get('schedule', 'Flexible')}
-        Social Preferences: {user_context.get('social_preference', 'Unknown')}
+        {user_profile}
         
         Recommend programs from: Workout Plans, Nutrition Guidance, Stress Management, 
         Sleep Improvement, Health Tracking, Habit Building, Mindfulness, Community Support
@@ -180,22 +231,39 @@ class HealthProfileAgent(BaseAgent):
         
         Prioritize recommendations and explain the reasoning.
         """
-        
-        return self.get_response(suggestion_prompt)
 
-    def progress_aware_guidance(self, user_id: str, current_query: str) -> str:
+    async def progress_aware_guidance(self, user_id: str, current_query: str) -> str:
         """Provide guidance that's aware of user's progress and history"""
         
-        # Get stored context
+        # Get stored context, compacted once per update
         stored_context = self.context_memory.get(user_id, {})
+        history = self._render_stored_context(
+            user_id, stored_context, "history", lambda context: compact_context(context, "progress_guidance")
+        ) if stored_context else "{}"
+        # What the uncompacted pretty-printed history would have cost, for reporting
+        raw_history_tokens = self._render_stored_context(
+            user_id, stored_context, "history_raw_tokens", lambda context: estimate_tokens(json.dumps(context, indent=2))
+        ) if stored_context else 1
+        
+        guidance_prompt = self._compacted_prompt(
+            "progress_guidance", lambda user_history: self._guidance_template(current_query, user_history),
+            history, raw_history_tokens,
+        )
         
-        guidance_prompt = f"""
+        # The history is already in the prompt, so skip the contextual wrapper that would repeat it
+        response = await self.aget_response(guidance_prompt, use_cache=False, operation="progress_aware_guidance")
+        self.history.record(user_id, current_query, response)
+        return response
+
+    @staticmethod
+    def _guidance_template(current_query: str, user_history: str) -> str:
+        return f"""
         Provide personalized guidance considering this user's history:
         
         CURRENT QUERY: {current_query}
         
         USER HISTORY:
-        {json.dumps(stored_context, indent=2)}
+        {user_history}
         
         Consider:
         - Their progress since last interaction
@@ -211,8 +279,13 @@ class HealthProfileAgent(BaseAgent):
         4. Maintains continuity with past advice
         5. Celebrates progress made
         """
-        
-        return self.get_contextual_response(guidance_prompt, stored_context, user_id)
+
+    @staticmethod
+    def _compacted_prompt(endpoint: str, template, compacted: str, raw_details_tokens: int) -> str:
+        """Fill a prompt template with compacted details and record the estimated savings"""
+        prompt = compact_prompt(template(compacted))
+        record_compaction(endpoint, estimate_tokens(template("")) + raw_details_tokens, prompt)
+        return prompt
 
     def _analyze_user_type(self, context: Dict[str, Any]) -> str:
         """Analyze user context to determine their type"""
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from . import metrics
+from .model_router import MODEL_TIERS
+
+logger = logging.getLogger(__name__)
+
+# Operations whose long, slow completions dominate their endpoints' tail latency
+DEFAULT_HEDGED_OPERATIONS = ("generate_workout_plan", "create_meal_plan", "create_meal_plan_day")
+
+
+class Hedger:
+    """
+    Hedged upstream calls for a few slow operations.
+
+    When an attempt hasn't finished by the observed latency percentile of its
+    operation, a duplicate is started (on hedge_model if set, else the same
+    model) and whichever completes successfully first wins; the other attempt
+    is cancelled. Every call earns max_hedge_ratio of a hedge credit and every
+    hedge spends a whole one, so hedges stay under that share of calls however
+    slow the upstream gets.
+    """
+
+    def __init__(self, operations: Iterable[str], percentile: float = 95, min_samples: int = 20,
+                 window: int = 200, min_delay: float = 1.0, max_hedge_ratio: float = 0.05,
+                 hedge_model: Optional[str] = None, enabled: bool = True):
+        self.operations = set(operations)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.hedge_model = hedge_model
+        self.enabled = enabled
+        self._latencies: Dict[str, deque] = {}
+        # Start with a single credit so the first slow call can be hedged
+        self._credit = 1.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+
+    def observe(self, operation: str, seconds: float):
+        with self._lock:
+            samples = self._latencies.get(operation)
+            if samples is None:
+                samples = self._latencies[operation] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def delay_for(self, operation: Optional[str]) -> Optional[float]:
+        """Seconds to wait before hedging operation, or None when it isn't hedged (yet)"""
+        if not self.enabled or operation not in self.operations:
+            return None
+        samples = self._latencies.get(operation)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def _take_credit(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            return True
+
+    async def run(self, operation: Optional[str], model_id: str,
+                  attempt: Callable[[str], Awaitable[Any]]) -> Any:
+        """Run attempt(model_id), hedging it with attempt(hedge model) when it is slow"""
+        if not self.enabled or operation not in self.operations:
+            return await attempt(model_id)
+        loop = asyncio.get_running_loop()
+        delay = self.delay_for(operation)
+        if delay is None:
+            # Still learning this operation's latency
+            return await self._timed(operation, attempt, model_id, loop)
+
+        with self._lock:
+            self.calls += 1
+            self._credit = min(1.0, self._credit + self.max_hedge_ratio)
+        primary = asyncio.ensure_future(self._timed(operation, attempt, model_id, loop))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            if not self._take_credit():
+                self.skipped += 1
+                metrics.llm_hedges.inc(operation, "skipped")
+                return await primary
+
+            self.hedges += 1
+            metrics.llm_hedges.inc(operation, "started")
+            hedge = asyncio.ensure_future(self._timed(operation, attempt, self.hedge_model or model_id, loop))
+            pending.add(hedge)
+            error = None
+            # The first attempt to succeed wins; a failure only counts once both have failed
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            metrics.llm_hedges.inc(operation, "won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, operation: str, attempt: Callable[[str], Awaitable[Any]], model_id: str,
+                     loop: asyncio.AbstractEventLoop) -> Any:
+        started = loop.time()
+        result = await attempt(model_id)
+        self.observe(operation, loop.time() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "operations": sorted(self.operations),
+            "hedge_model": self.hedge_model,
+            "max_hedge_ratio": self.max_hedge_ratio,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "skipped_over_budget": self.skipped,
+            "delays": {operation: self.delay_for(operation) for operation in sorted(self.operations)},
+        }
+
+
+def create_hedger() -> Hedger:
+    """
+    Hedger configured from HEDGE_* settings; off unless HEDGE_ENABLED=true.
+    HEDGE_TIER (small|large) sends hedges to that tier's model instead of the original one.
+    """
+    configured = os.getenv("HEDGE_OPERATIONS")
+    operations = [op.strip() for op in configured.split(",") if op.strip()] if configured else DEFAULT_HEDGED_OPERATIONS
+    tier = os.getenv("HEDGE_TIER")
+    if tier and tier not in MODEL_TIERS:
+        logger.warning("Ignoring HEDGE_TIER=%s, expected one of %s", tier, sorted(MODEL_TIERS))
+        tier = None
+    return Hedger(
+        operations,
+        percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+        min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+        min_delay=float(os.getenv("HEDGE_MIN_DELAY", "1")),
+        max_hedge_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.05")),
+        hedge_model=MODEL_TIERS[tier] if tier else None,
+        enabled=os.getenv("HEDGE_ENABLED", "false").lower() == "true",
+    )
+
+
+hedger = create_hedger()
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+from .request_context import request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class RollingHistory:
+    """
+    Bounded per-user interaction history kept inside an agent's stored context.
+
+    The last keep_recent interactions stay verbatim under "interactions". Once
+    more than summarize_after have piled up, a background task folds the older
+    ones into "history_summary" with one LLM call, so the history sent with
+    each prompt stays roughly the same size however long a user has been around.
+    """
+
+    def __init__(self, agent, keep_recent: int = 5, summarize_after: int = 10,
+                 summary_max_chars: int = 1200, excerpt_chars: int = 400):
+        self.agent = agent
+        self.keep_recent = keep_recent
+        self.summarize_after = max(summarize_after, keep_recent + 1)
+        self.summary_max_chars = summary_max_chars
+        self.excerpt_chars = excerpt_chars
+        self._summarizing = set()
+        # Strong references so pending summaries aren't garbage collected mid-run
+        self._tasks = set()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def record(self, user_id: str, query: str, response: str) -> Dict[str, Any]:
+        """Append an interaction and start a background summary once history crosses the threshold"""
+        interaction = {
+            "at": datetime.now().isoformat(),
+            "query": query[:self.excerpt_chars],
+            "response": str(response)[:self.excerpt_chars],
+        }
+        context = self.agent.modify_context(
+            user_id, lambda current: {**current, "interactions": current.get("interactions", []) + [interaction]}
+        )
+        if len(context.get("interactions", [])) > self.summarize_after:
+            self._schedule_summary(user_id)
+        return context
+
+    def _schedule_summary(self, user_id: str):
+        if user_id in self._summarizing:
+            return
+        # The summary outlives the request that triggered it, so it mustn't inherit its deadline
+        context = contextvars.copy_context()
+        context.run(request_deadline.set, None)
+        try:
+            task = asyncio.get_running_loop().create_task(self._summarize(user_id), context=context)
+        except RuntimeError:
+            # No event loop (sync caller); the next async interaction will pick it up
+            return
+        self._summarizing.add(user_id)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, user_id: str):
+        try:
+            context = self.agent.context_memory.get(user_id, {})
+            interactions = context.get("interactions", [])
+            older = interactions[:-self.keep_recent]
+            if not older:
+                return
+            summary = await self.agent.aget_response(
+                self._summary_prompt(context.get("history_summary"), older), use_cache=False,
+                operation="summarize_history",
+            )
+            folded = {interaction["at"] for interaction in older}
+
+            def fold(current: Dict[str, Any]) -> Dict[str, Any]:
+                # Interactions recorded while the summary was generated are kept as they are
+                remaining = [i for i in current.get("interactions", []) if i.get("at") not in folded]
+                return {**current, "interactions": remaining,
+                        "history_summary": str(summary).strip()[:self.summary_max_chars]}
+
+            self.agent.modify_context(user_id, fold)
+            self.summaries += 1
+        except Exception:
+            self.summary_failures += 1
+            logger.exception("Failed to summarize history for user %s", user_id)
+        finally:
+            self._summarizing.discard(user_id)
+
+    def _summary_prompt(self, previous_summary: str, interactions: List[Dict[str, Any]]) -> str:
+        lines = "\n".join(f"- [{i['at'][:10]}] Q: {i['query']} | A: {i['response']}" for i in interactions)
+        return f"""
+        Update this running summary of a user's health coaching history.
+
+        CURRENT SUMMARY: {previous_summary or 'None yet'}
+
+        NEW INTERACTIONS:
+        {lines}
+
+        Write at most {self.summary_max_chars // 6} words of plain text covering goals, progress,
+        challenges, preferences and advice already given. Keep facts, drop pleasantries.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keep_recent": self.keep_recent,
+            "summarize_after": self.summarize_after,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "in_progress": len(self._summarizing),
+        }
+
+
+def create_rolling_history(agent) -> RollingHistory:
+    return RollingHistory(
+        agent,
+        keep_recent=int(os.getenv("HISTORY_KEEP_RECENT", "5")),
+        summarize_after=int(os.getenv("HISTORY_SUMMARIZE_AFTER", "10")),
+        summary_max_chars=int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1200")),
+    )
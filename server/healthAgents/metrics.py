@@ -0,0 +1,136 @@
+import bisect
+from typing import Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, sized for LLM calls that take from ~100ms to a minute
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        # No lock: updates happen on the event loop thread, and a rare lost
+        # increment from a worker thread is an acceptable price for a free hot path
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def labelsets(self) -> List[Tuple[str, ...]]:
+        return list(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series.setdefault(labelvalues, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP layer, recorded by the server middleware
+http_requests = registry.counter(
+    "health_http_requests_total", "HTTP requests handled", ("route", "method", "status"))
+http_request_seconds = registry.histogram(
+    "health_http_request_duration_seconds", "Time to produce the response, per route", ("route",))
+http_errors = registry.counter(
+    "health_http_errors_total", "Failed HTTP requests by error type", ("route", "error_type"))
+
+# Upstream LLM layer, recorded by BaseAgent
+llm_calls = registry.counter(
+    "health_llm_calls_total", "Upstream LLM calls", ("route", "agent"))
+llm_call_seconds = registry.histogram(
+    "health_llm_call_duration_seconds", "Upstream LLM call latency", ("route", "agent"))
+llm_tokens = registry.counter(
+    "health_llm_tokens_total", "Tokens reported by the model", ("route", "agent", "kind"))
+llm_errors = registry.counter(
+    "health_llm_errors_total", "Failed upstream LLM calls by error type", ("route", "agent", "error_type"))
+llm_model_calls = registry.counter(
+    "health_llm_model_calls_total", "Upstream LLM calls per routed model", ("agent", "operation", "model"))
+llm_hedges = registry.counter(
+    "health_llm_hedges_total", "Hedged upstream calls: started, won by the hedge, or skipped over budget",
+    ("operation", "outcome"))
+upstream_rejections = registry.counter(
+    "health_upstream_rejections_total", "Calls turned away by the upstream limiter", ("reason",))
+upstream_queue_seconds = registry.histogram(
+    "health_upstream_queue_seconds", "Time calls waited for an upstream slot")
+local_answers = registry.counter(
+    "health_local_answers_total", "Agent questions answered from local indexes or handed to the model",
+    ("operation", "source"))
+cache_lookups = registry.counter(
+    "health_response_cache_lookups_total", "Response cache lookups", ("route", "agent", "result"))
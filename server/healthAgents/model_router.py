@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import os
+import weakref
+from typing import Dict, Optional
+
+import httpx
+from agno.models.groq import Groq
+from groq import AsyncGroq
+
+from .prompt_compaction import estimate_tokens
+from .request_context import requested_model_tier
+
+logger = logging.getLogger(__name__)
+
+MODEL_TIERS = {
+    "small": os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant"),
+    "large": os.getenv("GROQ_LARGE_MODEL", "llama-3.3-70b-versatile"),
+}
+DEFAULT_TIER = "large"
+
+# "<agent name>.<operation>" -> tier. Anything unlisted runs on DEFAULT_TIER.
+# Short, low-stakes replies go to the small model; assessments, plans and
+# anything safety-relevant (form cues, plateaus, research) stay on the large one.
+DEFAULT_ROUTES = {
+    "HealthProfiler.dynamic_greeting": "small",
+    "HealthProfiler.summarize_history": "small",
+    "ProgressTracker.celebrate_achievement": "small",
+    "FitnessCoach.suggest_exercise_alternatives": "small",
+    "NutritionExpert.suggest_food_alternatives": "small",
+    "NutritionExpert.provide_nutrition_tips": "small",
+    "HealthEducator.explain_health_concept": "small",
+}
+
+
+class ModelRouter:
+    """
+    Pick the model tier for an agent call.
+
+    In order: a valid X-Model-Tier request override, then the route table
+    (DEFAULT_ROUTES plus MODEL_ROUTES JSON from the environment), then the
+    default tier. Small-tier calls whose prompt is longer than
+    small_max_prompt_tokens are promoted to the large model.
+    """
+
+    def __init__(self, routes: Dict[str, str], small_max_prompt_tokens: int = 1500):
+        unknown = {tier for tier in routes.values() if tier not in MODEL_TIERS}
+        if unknown:
+            raise ValueError(f"Unknown model tiers in routes: {sorted(unknown)}")
+        self.routes = routes
+        self.small_max_prompt_tokens = small_max_prompt_tokens
+
+    def tier_for(self, agent_name: str, operation: Optional[str], prompt: str) -> str:
+        override = requested_model_tier.get()
+        if override in MODEL_TIERS:
+            return override
+        tier = self.routes.get(f"{agent_name}.{operation}", DEFAULT_TIER) if operation else DEFAULT_TIER
+        if tier == "small" and 0 < self.small_max_prompt_tokens < estimate_tokens(prompt):
+            return "large"
+        return tier
+
+    def model_for(self, agent_name: str, operation: Optional[str], prompt: str) -> str:
+        return MODEL_TIERS[self.tier_for(agent_name, operation, prompt)]
+
+
+def create_model_router() -> ModelRouter:
+    routes = dict(DEFAULT_ROUTES)
+    configured = os.getenv("MODEL_ROUTES")
+    if configured:
+        try:
+            routes.update(json.loads(configured))
+        except ValueError as e:
+            logger.warning("Ignoring MODEL_ROUTES, not valid JSON: %s", e)
+    return ModelRouter(routes, small_max_prompt_tokens=int(os.getenv("MODEL_ROUTER_SMALL_MAX_PROMPT_TOKENS", "1500")))
+
+
+model_router = create_model_router()
+
+
+# One AsyncGroq client (and so one connection pool and SSL context) per event loop.
+# agno's Groq model otherwise builds a fresh httpx.AsyncClient for every async call.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = weakref.WeakKeyDictionary()
+
+
+class SharedClientGroq(Groq):
+    def get_async_client(self) -> AsyncGroq:
+        if self.async_client:
+            return self.async_client
+        loop = asyncio.get_running_loop()
+        client = _async_clients.get(loop)
+        if client is None:
+            params = self._get_client_params()
+            # The SDK retries 429s itself, sleeping out Retry-After while holding an upstream
+            # slot; GROQ_MAX_RETRIES=0 hands them straight to the upstream limiter instead
+            params.setdefault("max_retries", int(os.getenv("GROQ_MAX_RETRIES", "2")))
+            client = AsyncGroq(
+                **params,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv("GROQ_MAX_CONNECTIONS", "100")),
+                        max_keepalive_connections=int(os.getenv("GROQ_MAX_KEEPALIVE", "20")),
+                    )
+                ),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+def build_model(model_id: str, max_tokens: Optional[int] = None) -> Groq:
+    # GROQ_BASE_URL points the agents at another endpoint, e.g. the local fake_groq_server.py
+    # GROQ_TIMEOUT bounds each HTTP call, including sync runs that request deadlines can't cancel
+    return SharedClientGroq(id=model_id, base_url=os.getenv("GROQ_BASE_URL"), max_tokens=max_tokens,
+                            timeout=float(os.getenv("GROQ_TIMEOUT", "60")))
@@ -0,0 +1,199 @@
+import csv
+import difflib
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .shopping_list import normalize_name, parse_quantity
+
+NUTRIENT_DB_PATH = os.getenv(
+    "NUTRIENT_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "nutrients.csv")
+)
+# Columns of the table, all per 100 g
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "fiber_g")
+# Foods without a grams_per_cup are converted as water
+DEFAULT_GRAMS_PER_CUP = 240.0
+
+# Unit spelling -> grams, or a factor on the food's grams_per_cup or grams_per_unit. grams_per_unit
+# is one piece for foods counted in pieces (eggs, slices) and a typical portion for the rest,
+# which is also what a food mentioned without a quantity counts as.
+MASS_UNITS = {"g": 1, "gram": 1, "grams": 1, "kg": 1000, "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+              "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6, "handful": 30, "handfuls": 30}
+VOLUME_UNITS = {"cup": 1, "cups": 1, "tbsp": 1 / 16, "tablespoon": 1 / 16, "tablespoons": 1 / 16,
+                "tsp": 1 / 48, "teaspoon": 1 / 48, "teaspoons": 1 / 48, "ml": 1 / 240, "glass": 1, "glasses": 1,
+                "bowl": 1.5, "bowls": 1.5}
+PORTION_UNITS = {"slice": 1, "slices": 1, "piece": 1, "pieces": 1, "serving": 1, "servings": 1,
+                 "fillet": 1, "fillets": 1, "scoop": 1, "scoops": 1, "can": 1, "cans": 1,
+                 "small": 0.75, "medium": 1, "large": 1.3}
+_UNITS = set(MASS_UNITS) | set(VOLUME_UNITS) | set(PORTION_UNITS)
+# Words left over from a partial name match that don't name another food
+FILLER_WORDS = {"a", "an", "the", "of", "with", "in", "on", "and", "style", "homemade", "plain", "side"}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "half": 0.5, "couple": 2, "few": 3, "some": 1}
+
+_SEPARATORS = re.compile(r",|;|\n|\+|\band\b|\bwith\b|\bplus\b|\bon\b", re.IGNORECASE)
+_QUANTITY = re.compile(r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?\s*[½⅓⅔¼¾]?|[½⅓⅔¼¾])\s*")
+_UNIT_ATTACHED = re.compile(r"^([a-z]+)\b\.?\s*(?:of\s+)?", re.IGNORECASE)
+
+
+class NutrientDB:
+    """
+    Compact food composition table held as NumPy columns.
+
+    Rows come from a small USDA-style CSV (per 100 g values plus typical
+    portion and cup weights). Names and aliases are normalized the same way as
+    meal text, so lookups are dictionary hits, with a fuzzy fallback. Macro
+    totals for a whole meal are one gather and one multiply over the matrix.
+    """
+
+    def __init__(self, names: List[str], aliases: Dict[str, int], per_100g: np.ndarray,
+                 grams_per_unit: np.ndarray, grams_per_cup: np.ndarray):
+        self.names = names
+        self.aliases = aliases
+        self.per_100g = per_100g
+        self.grams_per_unit = grams_per_unit
+        self.grams_per_cup = grams_per_cup
+        self._alias_keys = list(aliases)
+
+    @classmethod
+    def load(cls, path: str = NUTRIENT_DB_PATH) -> "NutrientDB":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        for line, row in enumerate(rows, 2):
+            # DictReader keeps extra fields under None and fills missing ones with None
+            if None in row or None in row.values():
+                raise ValueError(f"{path}:{line}: expected {len(reader.fieldnames)} fields in row {row['name']!r}")
+        names, aliases = [], {}
+        for index, row in enumerate(rows):
+            names.append(row["name"])
+            for alias in [row["name"]] + [a for a in row["aliases"].split("|") if a]:
+                aliases.setdefault(normalize_name(alias), index)
+        per_100g = np.array([[float(row[column]) for column in NUTRIENTS] for row in rows], dtype=np.float64)
+        grams_per_unit = np.array([float(row["grams_per_unit"] or 100) for row in rows], dtype=np.float64)
+        grams_per_cup = np.array([float(row["grams_per_cup"] or DEFAULT_GRAMS_PER_CUP) for row in rows],
+                                 dtype=np.float64)
+        return cls(names, aliases, per_100g, grams_per_unit, grams_per_cup)
+
+    def lookup(self, food: str) -> Optional[int]:
+        """Row of the food named in food: exact alias, then the longest alias inside it, then a close spelling"""
+        return self.match(food)[0]
+
+    def match(self, food: str) -> Tuple[Optional[int], List[str]]:
+        """
+        (row, leftover words) for the food named in food. Leftover words are
+        what a match on an alias inside the name didn't cover, e.g. "caesar
+        salad" of "chicken caesar salad"; they are empty for whole-name matches.
+        """
+        name = normalize_name(food)
+        if not name:
+            return None, []
+        if name in self.aliases:
+            return self.aliases[name], []
+        words = name.split()
+        for size in range(len(words) - 1, 0, -1):
+            for start in range(len(words) - size + 1):
+                candidate = " ".join(words[start:start + size])
+                if candidate in self.aliases:
+                    leftover = [word for word in words[:start] + words[start + size:] if word not in FILLER_WORDS]
+                    return self.aliases[candidate], leftover
+        close = difflib.get_close_matches(name, self._alias_keys, n=1, cutoff=0.85)
+        return (self.aliases[close[0]], []) if close else (None, [])
+
+    def parse_meal(self, description: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Split a meal description into portions: ([{"text", "row", "grams", "partial"}],
+        unmatched parts). A portion whose name only partly matched a food is
+        marked partial and the words the match didn't cover are unmatched.
+        """
+        portions, unmatched = [], []
+        for part in _SEPARATORS.split(description):
+            text = part.strip(" .!-*•\t")
+            if not text:
+                continue
+            portion = self._parse_portion(text)
+            if portion is None:
+                unmatched.append(text)
+                continue
+            leftover = portion.pop("leftover")
+            portion["partial"] = bool(leftover)
+            if leftover:
+                unmatched.append(f"{' '.join(leftover)} (in \"{text}\")")
+            portions.append(portion)
+        return portions, unmatched
+
+    def _parse_portion(self, text: str) -> Optional[Dict[str, Any]]:
+        rest = text
+        quantity = None
+        match = _QUANTITY.match(rest)
+        if match:
+            quantity = parse_quantity(match.group(1))
+            rest = rest[match.end():]
+        else:
+            first = rest.split(maxsplit=1)
+            if first and first[0].lower() in NUMBER_WORDS:
+                quantity = NUMBER_WORDS[first[0].lower()]
+                rest = first[1] if len(first) > 1 else ""
+
+        unit = None
+        match = _UNIT_ATTACHED.match(rest)
+        if match and match.group(1).lower() in _UNITS:
+            unit = match.group(1).lower()
+            rest = rest[match.end():]
+
+        row, leftover = self.match(rest)
+        if row is None:
+            return None
+        quantity = 1.0 if quantity is None else quantity
+        if unit in MASS_UNITS:
+            grams = quantity * MASS_UNITS[unit]
+        elif unit in VOLUME_UNITS:
+            grams = quantity * VOLUME_UNITS[unit] * self.grams_per_cup[row]
+        else:
+            grams = quantity * PORTION_UNITS.get(unit, 1) * self.grams_per_unit[row]
+        return {"text": text, "row": row, "grams": float(grams), "leftover": leftover}
+
+    def analyze(self, description: str) -> Dict[str, Any]:
+        """Per-item and total calories and macros for a free-text meal"""
+        portions, unmatched = self.parse_meal(description)
+        rows = np.fromiter((p["row"] for p in portions), dtype=np.intp, count=len(portions))
+        grams = np.fromiter((p["grams"] for p in portions), dtype=np.float64, count=len(portions))
+        # (items x nutrients) = per-100 g rows scaled by each portion's weight
+        amounts = self.per_100g[rows] * (grams / 100.0)[:, None]
+        totals = amounts.sum(axis=0)
+        items = [
+            dict({"food": self.names[portion["row"]], "text": portion["text"], "grams": round(portion["grams"]),
+                  "partial": portion["partial"]},
+                 **{nutrient: round(float(value), 1) for nutrient, value in zip(NUTRIENTS, amount)})
+            for portion, amount in zip(portions, amounts)
+        ]
+        return {
+            "items": items,
+            "totals": {nutrient: round(float(value), 1) for nutrient, value in zip(NUTRIENTS, totals)},
+            "unmatched": unmatched,
+            # Totals cover the whole meal only when every part was recognised in full
+            "complete": not unmatched,
+        }
+
+
+def render_analysis(analysis: Dict[str, Any]) -> str:
+    totals = analysis["totals"]
+    lines = [
+        "## Nutritional Breakdown",
+        f"**Total:** {totals['kcal']:.0f} kcal | protein {totals['protein_g']} g | carbs {totals['carbs_g']} g | "
+        f"fat {totals['fat_g']} g | fiber {totals['fiber_g']} g",
+        "",
+    ]
+    for item in analysis["items"]:
+        counted = f"{item['food']} only" if item["partial"] else item["food"]
+        lines.append(f"- {item['text']} ({counted}, ~{item['grams']} g): {item['kcal']:.0f} kcal, "
+                     f"P {item['protein_g']} g, C {item['carbs_g']} g, F {item['fat_g']} g")
+    if analysis["unmatched"]:
+        lines.append(f"\nNot in the food database, so not counted: {', '.join(analysis['unmatched'])}")
+        lines.append("The total above is a lower bound.")
+    return "\n".join(lines)
+
+
+nutrient_db = NutrientDB.load()
@@ -1,4 +1,27 @@
+import asyncio
+import os
+import uuid
+
+from . import metrics
 from .base_agent import BaseAgent
+from .context_store import create_context_store
+from .nutrient_db import nutrient_db, render_analysis
+from .nutrition_targets import daily_targets, format_targets
+from .shopping_list import INGREDIENT_FORMAT, aggregate, parse_ingredients, render_shopping_list
+from .substitutions import render_substitutions, substitution_index
+
+# Generate the 7-day plan as seven concurrent per-day calls unless a caller asks otherwise
+MEAL_PLAN_PARALLEL = os.getenv("MEAL_PLAN_PARALLEL", "true").lower() == "true"
+# One protein focus per day keeps independently generated days from repeating each other
+DAY_FOCUS = (
+    "poultry",
+    "fish or seafood",
+    "beans and lentils",
+    "eggs and dairy",
+    "lean red meat",
+    "tofu or tempeh",
+    "a mix of the week's favourites",
+)
 
 class NutritionAgent(BaseAgent):
     def __init__(self):
@@ -17,8 +40,10 @@ class NutritionAgent(BaseAgent):
             "High-protein",
             "Anti-inflammatory"
         ]
+        # plan_id -> ingredients parsed from a generated meal plan, for local shopping lists
+        self.meal_plans = create_context_store(namespace=f"{self.name}.meal_plans")
 
-    def create_meal_plan(self, user_profile):
+    async def create_meal_plan(self, user_profile, parallel=None):
         """
         Create a personalized meal plan based on user profile
         
@@ -28,8 +53,78 @@ class NutritionAgent(BaseAgent):
         - allergies: list of food allergies
         - goal: weight loss, muscle gain, maintenance, etc.
         - meal_preferences: breakfast, lunch, dinner preferences
+
+        parallel (default MEAL_PLAN_PARALLEL) computes the daily targets locally
+        and generates each day with its own concurrent call, so the plan takes
+        about as long as one day instead of the whole week.
         """
-        prompt = f"""
+        if not self._parallel(parallel):
+            return await self.aget_response(self._meal_plan_prompt(user_profile), operation="create_meal_plan")
+        return "".join([part async for part in self._parallel_meal_plan(user_profile)])
+
+    def stream_meal_plan(self, user_profile, parallel=None):
+        """Stream the meal plan as it is generated; in parallel mode, one day at a time"""
+        if not self._parallel(parallel):
+            return self.astream_response(self._meal_plan_prompt(user_profile), operation="create_meal_plan")
+        return self._parallel_meal_plan(user_profile)
+
+    @staticmethod
+    def _parallel(parallel):
+        return MEAL_PLAN_PARALLEL if parallel is None else parallel
+
+    async def _parallel_meal_plan(self, user_profile):
+        """Yield the plan header, then each day in order as soon as it is ready"""
+        targets = daily_targets(user_profile)
+        days = [
+            asyncio.ensure_future(self.aget_response(
+                self._meal_plan_day_prompt(user_profile, targets, day), operation="create_meal_plan_day"
+            ))
+            for day in range(1, len(DAY_FOCUS) + 1)
+        ]
+        try:
+            yield self._meal_plan_header(user_profile, targets)
+            for day, task in enumerate(days, 1):
+                yield f"\n\n## Day {day}\n\n{str(await task).strip()}"
+        finally:
+            for task in days:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Retrieved so a failed day nobody awaited isn't logged again
+
+    def _meal_plan_header(self, user_profile, targets):
+        basis = ("calculated from your age, weight, height, activity level and goal" if targets["personalized"]
+                 else "general targets; share your age, weight and height for personalized ones")
+        return (
+            f"# 7-Day Meal Plan\n\n"
+            f"**Daily targets:** {format_targets(targets)} ({basis})\n\n"
+            f"**Dietary preferences:** {user_profile.get('dietary_preferences', 'No specific preferences')} | "
+            f"**Allergies:** {user_profile.get('allergies', 'None mentioned')} | "
+            f"**Goal:** {user_profile.get('goal', 'General health')}"
+        )
+
+    def _meal_plan_day_prompt(self, user_profile, targets, day):
+        return f"""
+        Write day {day} of a 7-day meal plan.
+
+        Daily targets: {format_targets(targets)}
+        Dietary Preferences: {user_profile.get('dietary_preferences', 'No specific preferences')}
+        Allergies: {user_profile.get('allergies', 'None mentioned')}
+        Meal Preferences: {user_profile.get('meal_preferences', 'None mentioned')}
+        Goal: {user_profile.get('goal', 'General health')}
+        {f"Health Assessment: {user_profile['health_assessment']}" if user_profile.get('health_assessment') else ""}
+
+        Build this day's main meals around {DAY_FOCUS[day - 1]}, adapted to the dietary preferences and allergies.
+        Give breakfast, lunch, dinner and 2 snacks. For each: the dish, approximate calories and protein,
+        and one or two lines of preparation. The day should add up to the daily targets.
+
+        Start directly with breakfast: no title, introduction, weekly overview or shopping list.
+        End with a line reading "Ingredients:" followed by every ingredient of the day, one per line, as
+        {INGREDIENT_FORMAT}. Use g, ml, or counts (whole, cloves, slices, cans).
+        """
+
+    def _meal_plan_prompt(self, user_profile):
+        return f"""
         Create a personalized meal plan based on the following profile:
         
         Age: {user_profile.get('age', 'Not specified')}
@@ -39,20 +134,31 @@ class NutritionAgent(BaseAgent):
         Dietary Preferences: {user_profile.get('dietary_preferences', 'No specific preferences')}
         Allergies: {user_profile.get('allergies', 'None mentioned')}
         Goal: {user_profile.get('goal', 'General health')}
+        {f"Health Assessment: {user_profile['health_assessment']}" if user_profile.get('health_assessment') else ""}
         
         Create a 7-day meal plan that includes:
         1. Daily calorie targets
         2. Macro breakdown (protein, carbs, fats)
         3. Breakfast, lunch, dinner, and 2 snack options for each day
         4. Simple preparation instructions
-        5. Shopping list for the week
+        5. At the end of each day, a line reading "Ingredients:" followed by every ingredient of the day,
+           one per line, as {INGREDIENT_FORMAT}. Use g, ml, or counts (whole, cloves, slices, cans).
         
         Make it practical and achievable for someone with a normal lifestyle.
         """
-        return self.get_response(prompt)
     
-    def suggest_food_alternatives(self, food, dietary_restriction):
-        """Suggest healthy alternatives for a specific food based on dietary needs"""
+    async def suggest_food_alternatives(self, food, dietary_restriction):
+        """
+        Suggest healthy alternatives for a specific food based on dietary needs.
+        Known foods and restrictions are answered from the substitution index;
+        the model is only asked about the rest.
+        """
+        result = substitution_index.lookup(food, dietary_restriction)
+        if result is not None:
+            metrics.local_answers.inc("suggest_food_alternatives", "index")
+            return {"response": render_substitutions(result, dietary_restriction), "source": "index",
+                    "alternatives": result["alternatives"]}
+        metrics.local_answers.inc("suggest_food_alternatives", "model")
         prompt = f"""
         Suggest 3-5 healthy alternatives to {food} for someone with {dietary_restriction} dietary restrictions.
         
@@ -63,10 +169,50 @@ class NutritionAgent(BaseAgent):
         4. Where to typically find it
         5. Taste and texture description
         """
-        return self.get_response(prompt)
+        return {"response": await self.aget_response(prompt, operation="suggest_food_alternatives"),
+                "source": "model"}
     
-    def analyze_meal(self, meal_description):
-        """Analyze the nutritional content and health aspects of a described meal"""
+    async def analyze_meal(self, meal_description, numbers_only=False):
+        """
+        Analyze the nutritional content and health aspects of a described meal.
+
+        Calories and macros come from the local nutrient database; the model
+        only writes the commentary, and isn't called at all with numbers_only.
+        Parts of the meal the database didn't recognise are left for the model
+        to estimate, and meals with no recognisable food to the model entirely.
+        """
+        analysis = nutrient_db.analyze(meal_description)
+        if not analysis["items"]:
+            return {"response": await self._estimate_meal(meal_description), "nutrition": None}
+        breakdown = render_analysis(analysis)
+        if numbers_only:
+            return {"response": breakdown, "nutrition": analysis}
+        prompt = f"""
+        Comment on this meal: "{meal_description}"
+
+        Its nutrition has already been calculated:
+        {breakdown}
+
+        Provide:
+        1. Health benefits of the ingredients
+        2. Potential improvements or additions
+        3. How it fits into different dietary goals
+        4. Timing recommendations (best time of day to eat this)
+
+        {self._numbers_instruction(analysis)}
+        Be encouraging while providing constructive feedback.
+        """
+        commentary = await self.aget_response(prompt, operation="analyze_meal")
+        return {"response": f"{breakdown}\n\n{commentary}", "nutrition": analysis}
+
+    @staticmethod
+    def _numbers_instruction(analysis):
+        if analysis["complete"]:
+            return "Use the numbers above as given; don't restate or re-estimate them."
+        return ("The numbers above leave out the parts listed as not counted. Estimate the calories and "
+                "macros of those parts, then give an adjusted total for the whole meal.")
+
+    async def _estimate_meal(self, meal_description):
         prompt = f"""
         Analyze this meal: "{meal_description}"
         
@@ -79,9 +225,9 @@ class NutritionAgent(BaseAgent):
         
         Be encouraging while providing constructive feedback.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="estimate_meal")
     
-    def provide_nutrition_tips(self, goal):
+    async def provide_nutrition_tips(self, goal):
         """Provide targeted nutrition tips based on a specific goal"""
         prompt = f"""
         Provide 5-7 practical nutrition tips specifically for someone whose goal is {goal}.
@@ -94,9 +240,33 @@ class NutritionAgent(BaseAgent):
         
         Include both what to do and why it helps with their specific goal.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="provide_nutrition_tips")
     
-    def create_shopping_list(self, dietary_preference, days=7):
+    def save_meal_plan(self, meal_plan, user_profile):
+        """Keep the ingredients of a generated meal plan; returns the plan_id to build its shopping list from"""
+        plan_id = uuid.uuid4().hex
+        self.meal_plans.update(plan_id, {
+            "ingredients": parse_ingredients(str(meal_plan)),
+            "dietary_preference": user_profile.get("dietary_preferences") or "balanced",
+        })
+        return plan_id
+
+    async def shopping_list_for_plan(self, plan_id):
+        """
+        Weekly shopping list for a saved meal plan, summed and grouped locally.
+        Returns None for an unknown plan_id; falls back to the model only when
+        no ingredients could be read from the plan.
+        """
+        plan = self.meal_plans.get(plan_id)
+        if plan is None:
+            return None
+        if not plan.get("ingredients"):
+            response = await self.create_shopping_list(plan.get("dietary_preference", "balanced"))
+            return {"response": response, "plan_id": plan_id, "shopping_list": None}
+        sections = aggregate(plan["ingredients"])
+        return {"response": render_shopping_list(sections), "plan_id": plan_id, "shopping_list": sections}
+
+    async def create_shopping_list(self, dietary_preference, days=7):
         """Create a healthy shopping list based on dietary preferences"""
         prompt = f"""
         Create a {days}-day shopping list for someone following a {dietary_preference} diet.
@@ -111,4 +281,4 @@ class NutritionAgent(BaseAgent):
         
         Include estimated quantities for 1-2 people and focus on versatile ingredients that can be used in multiple meals.
         """
-        return self.get_response(prompt) 
\ No newline at end of file
+        return await self.aget_response(prompt, operation="create_shopping_list") 
\ No newline at end of file
@@ -0,0 +1,90 @@
+import re
+from typing import Any, Dict, Optional
+
+# Multipliers on resting energy expenditure
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very active": 1.9,
+}
+DEFAULT_ACTIVITY_FACTOR = 1.375
+
+# (keyword in the goal, calorie adjustment, protein grams per kg of body weight)
+GOAL_ADJUSTMENTS = (
+    ("loss", -500, 1.8),
+    ("lose", -500, 1.8),
+    ("cut", -500, 1.8),
+    ("muscle", 300, 1.8),
+    ("gain", 300, 1.8),
+    ("bulk", 300, 1.8),
+)
+MAINTENANCE_PROTEIN_PER_KG = 1.2
+FAT_SHARE = 0.30
+MIN_CALORIES = 1200
+
+# Used when the profile lacks age, weight or height
+DEFAULT_TARGETS = {"calories": 2000, "protein_g": 100, "carbs_g": 225, "fat_g": 67, "personalized": False}
+
+
+def _number(value: Any) -> Optional[float]:
+    """First number in a profile value such as 70, "70", or "70 kg"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"\d+(?:\.\d+)?", str(value or ""))
+    return float(match.group()) if match else None
+
+
+def _activity_factor(activity_level: Any) -> float:
+    level = str(activity_level or "").lower()
+    # Longest names first so "very active" isn't read as "active"
+    for name in sorted(ACTIVITY_FACTORS, key=len, reverse=True):
+        if name in level:
+            return ACTIVITY_FACTORS[name]
+    return DEFAULT_ACTIVITY_FACTOR
+
+
+def daily_targets(user_profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Daily calorie and macro targets from a profile, without calling the model.
+
+    Energy needs follow the Mifflin-St Jeor equation times an activity factor,
+    adjusted for the goal. Protein is set per kg of body weight, fat at 30% of
+    calories and carbs take the rest. Profiles missing age, weight or height
+    get DEFAULT_TARGETS, marked personalized=False.
+    """
+    age = _number(user_profile.get("age"))
+    weight = _number(user_profile.get("weight"))
+    height = _number(user_profile.get("height"))
+    if not (age and weight and height):
+        return dict(DEFAULT_TARGETS)
+
+    sex = str(user_profile.get("sex") or user_profile.get("gender") or "").lower()
+    # Without a stated sex, use the midpoint of the male (+5) and female (-161) offsets
+    offset = 5 if sex.startswith("m") else -161 if sex.startswith("f") else -78
+    resting = 10 * weight + 6.25 * height - 5 * age + offset
+
+    goal = str(user_profile.get("goal") or "").lower()
+    adjustment, protein_per_kg = 0, MAINTENANCE_PROTEIN_PER_KG
+    for keyword, goal_adjustment, goal_protein in GOAL_ADJUSTMENTS:
+        if keyword in goal:
+            adjustment, protein_per_kg = goal_adjustment, goal_protein
+            break
+
+    calories = max(MIN_CALORIES, resting * _activity_factor(user_profile.get("activity_level")) + adjustment)
+    protein_g = weight * protein_per_kg
+    fat_g = calories * FAT_SHARE / 9
+    carbs_g = max(0.0, (calories - protein_g * 4 - fat_g * 9) / 4)
+    return {
+        "calories": int(round(calories, -1)),
+        "protein_g": int(round(protein_g)),
+        "carbs_g": int(round(carbs_g)),
+        "fat_g": int(round(fat_g)),
+        "personalized": True,
+    }
+
+
+def format_targets(targets: Dict[str, Any]) -> str:
+    return (f"{targets['calories']} kcal, {targets['protein_g']} g protein, "
+            f"{targets['carbs_g']} g carbs, {targets['fat_g']} g fat")
@@ -0,0 +1,130 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+from .health_profile_agent import HealthProfileAgent
+from .nutrition_agent import NutritionAgent
+from .prompt_compaction import fit_to_budget, token_budget
+from .workout_plan_agent import WorkoutPlanAgent
+
+
+class PipelineNode:
+    """One step of a pipeline; run receives the results of its finished dependencies"""
+
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 depends_on: Iterable[str] = ()):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+
+class DagExecutor:
+    """Run pipeline nodes as soon as their dependencies finish, yielding results as they complete"""
+
+    def __init__(self, nodes: List[PipelineNode]):
+        self.nodes = {node.name: node for node in nodes}
+        for node in nodes:
+            missing = [dep for dep in node.depends_on if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Node '{node.name}' depends on unknown nodes: {missing}")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.nodes[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    async def run(self):
+        """
+        Async generator of (node_name, result, error) tuples in completion order.
+
+        A node starts once all of its dependencies have finished. It receives the
+        results of the dependencies that succeeded, so a failed enrichment step
+        degrades downstream output instead of blocking it.
+        """
+        results: Dict[str, Any] = {}
+        finished = set()
+        running: Dict[asyncio.Task, str] = {}
+        waiting = dict(self.nodes)
+
+        def start_ready():
+            for name, node in list(waiting.items()):
+                if all(dep in finished for dep in node.depends_on):
+                    upstream = {dep: results[dep] for dep in node.depends_on if dep in results}
+                    running[asyncio.ensure_future(node.run(upstream))] = name
+                    del waiting[name]
+
+        start_ready()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    finished.add(name)
+                    error = task.exception()
+                    if error is None:
+                        results[name] = task.result()
+                        yield name, results[name], None
+                    else:
+                        yield name, None, error
+                start_ready()
+        finally:
+            # The consumer went away (e.g. client disconnected): stop outstanding work
+            for task in running:
+                task.cancel()
+
+
+def build_onboarding_pipeline(profile_agent: HealthProfileAgent, workout_agent: WorkoutPlanAgent,
+                              nutrition_agent: NutritionAgent, user_profile: Dict[str, Any],
+                              enrich_plans: bool = False) -> DagExecutor:
+    """
+    Onboarding DAG over the existing agents.
+
+    The assessment, workout plan and meal plan start together. The adaptive
+    program waits for the assessment and gets its text in the prompt; with
+    enrich_plans the two plans wait for it too and get a trimmed copy. The
+    meal plan is saved like one from the meal plan route, so its result
+    carries a plan_id for shopping lists.
+    """
+
+    def enriched_profile(upstream: Dict[str, Any], endpoint: str) -> Dict[str, Any]:
+        profile = dict(user_profile)
+        assessment = (upstream.get('assessment') or {}).get('assessment')
+        if assessment:
+            profile['health_assessment'] = fit_to_budget(
+                {'health_assessment': str(assessment)}, token_budget(endpoint)
+            )['health_assessment']
+        return profile
+
+    async def assessment(upstream):
+        return await profile_agent.intelligent_assessment(user_profile)
+
+    async def adaptive_program(upstream):
+        return await profile_agent.adaptive_program_suggestion(enriched_profile(upstream, "adaptive_program"))
+
+    async def workout_plan(upstream):
+        return await workout_agent.generate_workout_plan(enriched_profile(upstream, "onboarding_plans"))
+
+    async def meal_plan(upstream):
+        profile = enriched_profile(upstream, "onboarding_plans")
+        plan = await nutrition_agent.create_meal_plan(profile)
+        return {"response": plan, "plan_id": nutrition_agent.save_meal_plan(plan, user_profile)}
+
+    plan_dependencies = ("assessment",) if enrich_plans else ()
+    return DagExecutor([
+        PipelineNode("assessment", assessment),
+        PipelineNode("adaptive_program", adaptive_program, depends_on=("assessment",)),
+        PipelineNode("workout_plan", workout_plan, depends_on=plan_dependencies),
+        PipelineNode("meal_plan", meal_plan, depends_on=plan_dependencies),
+    ])
@@ -0,0 +1,142 @@
+import bisect
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from .request_context import requested_detail
+
+logger = logging.getLogger(__name__)
+
+# Starting max_tokens per operation, before any completions have been observed
+DEFAULT_MAX_TOKENS = {
+    "dynamic_greeting": 120,
+    "celebrate_achievement": 150,
+    "summarize_history": 300,
+    "suggest_exercise_alternatives": 400,
+    "suggest_food_alternatives": 400,
+    "provide_nutrition_tips": 500,
+    "debunk_health_myth": 500,
+    "explain_health_concept": 600,
+    "answer_health_question": 600,
+    "analyze_meal": 450,
+    "estimate_meal": 600,
+    "create_meal_plan_day": 600,
+    "create_quick_workout": 600,
+    "provide_form_guidance": 600,
+    "address_plateau": 700,
+    "progress_aware_guidance": 800,
+    "suggest_plan_adjustments": 800,
+    "compare_health_approaches": 800,
+    "provide_research_summary": 900,
+    "analyze_progress": 900,
+    "create_shopping_list": 900,
+    "adaptive_program_suggestion": 1000,
+    "create_milestone_plan": 1000,
+    "create_educational_content": 1200,
+    "intelligent_assessment": 1500,
+    "generate_workout_plan": 1500,
+    "create_meal_plan": 2000,
+}
+FALLBACK_MAX_TOKENS = 1024
+
+# The X-Response-Detail knob scales the standard budget
+DETAIL_MULTIPLIERS = {"brief": 0.5, "standard": 1.0, "detailed": 2.0}
+DETAIL_INSTRUCTIONS = {
+    "brief": "Keep the response brief: only the essentials, no preamble.",
+    "detailed": "Give a thorough, detailed response.",
+}
+
+# Budgets are rounded up to one of these so a handful of model configurations cover every call
+BUDGET_BUCKETS = (128, 192, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096)
+
+
+class OutputBudget:
+    """
+    Per-operation max_tokens that follows observed completion lengths.
+
+    Until min_samples completions of an operation have been seen its configured
+    default applies. After that the budget is the observed percentile (over a
+    sliding window) plus headroom, so verbose endpoints get a cap close to what
+    they really produce. A truncated completion lands at the cap and pushes the
+    percentile up, so the budget grows back when it was set too tight.
+    """
+
+    def __init__(self, defaults: Dict[str, int], window: int = 200, min_samples: int = 20,
+                 percentile: float = 95, headroom: float = 1.25, adaptive: bool = True):
+        self.defaults = defaults
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.headroom = headroom
+        self.adaptive = adaptive
+        self._observed: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation: Optional[str], completion_tokens: int, detail: str = "standard"):
+        # Brief and detailed requests would skew the standard budget either way
+        if not operation or detail != "standard" or completion_tokens <= 0:
+            return
+        with self._lock:
+            samples = self._observed.get(operation)
+            if samples is None:
+                samples = self._observed[operation] = deque(maxlen=self.window)
+            samples.append(completion_tokens)
+
+    def standard_budget(self, operation: Optional[str]) -> int:
+        default = self.defaults.get(operation, FALLBACK_MAX_TOKENS)
+        samples = self._observed.get(operation) if self.adaptive else None
+        if not samples or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(64, int(ordered[index] * self.headroom))
+
+    def max_tokens_for(self, operation: Optional[str], detail: str = "standard") -> int:
+        budget = self.standard_budget(operation) * DETAIL_MULTIPLIERS.get(detail, 1.0)
+        return BUDGET_BUCKETS[min(bisect.bisect_left(BUDGET_BUCKETS, budget), len(BUDGET_BUCKETS) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for operation in sorted(set(self.defaults) | set(self._observed)):
+            samples = self._observed.get(operation, ())
+            stats[operation] = {
+                "default": self.defaults.get(operation, FALLBACK_MAX_TOKENS),
+                "samples": len(samples),
+                "standard_budget": self.standard_budget(operation),
+                "max_tokens": {detail: self.max_tokens_for(operation, detail) for detail in DETAIL_MULTIPLIERS},
+            }
+        return stats
+
+
+def current_detail() -> str:
+    detail = requested_detail.get()
+    return detail if detail in DETAIL_MULTIPLIERS else "standard"
+
+
+def apply_detail(prompt: str, detail: str) -> str:
+    instruction = DETAIL_INSTRUCTIONS.get(detail)
+    return f"{prompt}\n\n{instruction}" if instruction else prompt
+
+
+def create_output_budget() -> OutputBudget:
+    defaults = dict(DEFAULT_MAX_TOKENS)
+    configured = os.getenv("OUTPUT_TOKEN_DEFAULTS")
+    if configured:
+        try:
+            defaults.update(json.loads(configured))
+        except ValueError as e:
+            logger.warning("Ignoring OUTPUT_TOKEN_DEFAULTS, not valid JSON: %s", e)
+    return OutputBudget(
+        defaults,
+        window=int(os.getenv("OUTPUT_BUDGET_WINDOW", "200")),
+        min_samples=int(os.getenv("OUTPUT_BUDGET_MIN_SAMPLES", "20")),
+        percentile=float(os.getenv("OUTPUT_BUDGET_PERCENTILE", "95")),
+        headroom=float(os.getenv("OUTPUT_BUDGET_HEADROOM", "1.25")),
+        adaptive=os.getenv("OUTPUT_BUDGET_ADAPTIVE", "true").lower() == "true",
+    )
+
+
+output_budget = create_output_budget()
@@ -19,7 +19,7 @@ class ProgressTrackingAgent(BaseAgent):
             "Nutritional habits"
         ]
 
-    def analyze_progress(self, user_data):
+    async def analyze_progress(self, user_data):
         """
         Analyze user's progress based on tracked data
         
@@ -47,9 +47,9 @@ class ProgressTrackingAgent(BaseAgent):
         
         Be encouraging and focus on both progress made and realistic next steps.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="analyze_progress")
     
-    def suggest_plan_adjustments(self, current_plan, progress_data):
+    async def suggest_plan_adjustments(self, current_plan, progress_data):
         """Suggest adjustments to current plan based on progress"""
         prompt = f"""
         Based on the current plan: "{current_plan}"
@@ -63,9 +63,9 @@ class ProgressTrackingAgent(BaseAgent):
         
         Explain why each adjustment would be beneficial and how to implement it gradually.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="suggest_plan_adjustments")
     
-    def create_milestone_plan(self, goal, current_status, timeframe):
+    async def create_milestone_plan(self, goal, current_status, timeframe):
         """Create a milestone plan to reach a specific goal"""
         prompt = f"""
         Create a milestone plan for this goal: "{goal}"
@@ -81,9 +81,9 @@ class ProgressTrackingAgent(BaseAgent):
         
         Make it motivating and achievable with clear action steps.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="create_milestone_plan")
     
-    def address_plateau(self, plateau_data):
+    async def address_plateau(self, plateau_data):
         """Provide strategies for breaking through plateaus"""
         prompt = f"""
         Help address this plateau situation: "{plateau_data}"
@@ -97,9 +97,9 @@ class ProgressTrackingAgent(BaseAgent):
         
         Be empathetic and provide practical, science-based solutions.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="address_plateau")
     
-    def celebrate_achievement(self, achievement):
+    async def celebrate_achievement(self, achievement):
         """Create a celebration message and suggest next steps after an achievement"""
         prompt = f"""
         Celebrate this achievement: "{achievement}"
@@ -113,4 +113,4 @@ class ProgressTrackingAgent(BaseAgent):
         
         Make it personal and motivating while encouraging continued growth.
         """
-        return self.get_response(prompt) 
\ No newline at end of file
+        return await self.aget_response(prompt, operation="celebrate_achievement") 
\ No newline at end of file
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, Tuple
+
+from . import metrics
+
+# Filler the prompt templates used for missing fields; they tell the model nothing
+PLACEHOLDER_VALUES = {
+    "", "none", "null", "n/a", "unknown", "not provided", "not specified", "none mentioned",
+}
+
+# Per-endpoint token budgets for the user context part of a prompt
+DEFAULT_TOKEN_BUDGETS = {
+    "intelligent_assessment": 600,
+    "adaptive_program": 700,
+    "onboarding_plans": 250,
+    "progress_guidance": 800,
+}
+
+# Rough chars-per-token ratio of the Llama tokenizer on English and JSON
+CHARS_PER_TOKEN = 4
+
+prompt_tokens = metrics.registry.counter(
+    "health_prompt_tokens_estimated_total",
+    "Estimated prompt tokens before (raw) and after (compacted) prompt compaction",
+    ("endpoint", "stage"),
+)
+
+# A prompt section is (title, ((label, key, default), ...))
+Section = Tuple[str, Tuple[Tuple[str, str, str], ...]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate; close enough for budgeting and reporting"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def token_budget(endpoint: str) -> int:
+    """Budget for an endpoint, overridable with PROMPT_TOKEN_BUDGET_<ENDPOINT>"""
+    override = os.getenv(f"PROMPT_TOKEN_BUDGET_{endpoint.upper()}")
+    return int(override) if override else DEFAULT_TOKEN_BUDGETS.get(endpoint, 600)
+
+
+def is_placeholder(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() in PLACEHOLDER_VALUES
+    if isinstance(value, (list, tuple, set, dict)):
+        return len(value) == 0
+    return False
+
+
+def drop_empty(value: Any) -> Any:
+    """Recursively drop empty and placeholder fields from dicts and lists"""
+    if isinstance(value, dict):
+        compacted = {key: drop_empty(item) for key, item in value.items()}
+        return {key: item for key, item in compacted.items() if not is_placeholder(item)}
+    if isinstance(value, (list, tuple)):
+        compacted = [drop_empty(item) for item in value]
+        return [item for item in compacted if not is_placeholder(item)]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def fit_to_budget(context: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """
+    Shrink a compacted context until its JSON fits the token budget.
+
+    The oldest entry of the longest list goes first (history lists are kept
+    oldest-first), then the longest string is halved, so recent history and
+    short facts survive the longest.
+    """
+    context = dict(context)
+    for _ in range(1000):
+        if estimate_tokens(compact_json(context)) <= budget:
+            break
+        lists = [(len(value), key) for key, value in context.items() if isinstance(value, list) and value]
+        if lists:
+            key = max(lists)[1]
+            context[key] = context[key][1:]
+            continue
+        strings = [(len(value), key) for key, value in context.items() if isinstance(value, str) and len(value) > 16]
+        if strings:
+            key = max(strings)[1]
+            context[key] = context[key][:len(context[key]) // 2] + "…"
+            continue
+        # Nothing left to shorten but nested objects; drop the largest one
+        key = max(context, key=lambda name: len(compact_json(context[name])))
+        del context[key]
+    return context
+
+
+def compact_context(context: Dict[str, Any], endpoint: str) -> str:
+    """Compact JSON of a stored context, trimmed to the endpoint's token budget"""
+    return compact_json(fit_to_budget(drop_empty(context), token_budget(endpoint)))
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_format_value(item) for item in value)
+    if isinstance(value, dict):
+        return compact_json(value)
+    return str(value)
+
+
+def render_sections(sections: Iterable[Section], data: Dict[str, Any], endpoint: str) -> str:
+    """Render only the fields that carry information, within the endpoint's token budget"""
+    present = drop_empty({key: data.get(key) for _, fields in sections for _, key, _ in fields})
+    present = fit_to_budget(present, token_budget(endpoint))
+    lines = []
+    for title, fields in sections:
+        values = [f"{label}: {_format_value(present[key])}" for label, key, _ in fields if key in present]
+        if values:
+            lines.append(f"{title}:")
+            lines.extend(values)
+    return "\n".join(lines) if lines else "No details provided."
+
+
+def render_sections_verbose(sections: Iterable[Section], data: Dict[str, Any]) -> str:
+    """The uncompacted layout, every field with its default; used to measure savings"""
+    lines = []
+    for title, fields in sections:
+        lines.append(f"{title}:")
+        lines.extend(f"{label}: {data.get(key, default)}" for label, key, default in fields)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def compact_prompt(text: str) -> str:
+    """Strip template indentation and blank lines, which cost tokens but carry nothing"""
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def record_compaction(endpoint: str, raw_tokens: int, compacted_prompt: str):
+    prompt_tokens.inc(endpoint, "raw", amount=raw_tokens)
+    prompt_tokens.inc(endpoint, "compacted", amount=estimate_tokens(compacted_prompt))
+
+
+def compaction_stats() -> Dict[str, Any]:
+    """Estimated prompt tokens saved per endpoint since startup"""
+    endpoints = {labels[0] for labels in prompt_tokens.labelsets()}
+    stats = {}
+    for endpoint in sorted(endpoints):
+        raw = prompt_tokens.value(endpoint, "raw")
+        compacted = prompt_tokens.value(endpoint, "compacted")
+        stats[endpoint] = {
+            "raw_tokens": raw,
+            "compacted_tokens": compacted,
+            "reduction": round(1 - compacted / raw, 4) if raw else 0.0,
+            "budget": token_budget(endpoint),
+        }
+    return stats
@@ -0,0 +1,11 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# Per-request state set by the server middleware and read deep in the agent call path
+current_route: ContextVar[str] = ContextVar("current_route", default="direct")
+# Model tier requested through the X-Model-Tier header, or None to let the router decide
+requested_model_tier: ContextVar[Optional[str]] = ContextVar("requested_model_tier", default=None)
+# Response detail requested through the X-Response-Detail header: brief, standard or detailed
+requested_detail: ContextVar[Optional[str]] = ContextVar("requested_detail", default=None)
+# time.monotonic() by which the current request must be answered, or None for no deadline
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
@@ -0,0 +1,166 @@
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Line format the meal plan prompts ask the model to list each day's ingredients in
+INGREDIENT_FORMAT = "- <quantity> <unit> <ingredient>, e.g. \"- 150 g chicken breast\", \"- 2 whole eggs\""
+
+# Unit spelling -> (canonical unit, factor). Weights sum in grams, volumes in millilitres
+# and everything else as a count of the named unit.
+UNITS = {
+    "g": ("g", 1), "gram": ("g", 1), "grams": ("g", 1),
+    "kg": ("g", 1000), "kilogram": ("g", 1000), "kilograms": ("g", 1000),
+    "oz": ("g", 28.35), "ounce": ("g", 28.35), "ounces": ("g", 28.35),
+    "lb": ("g", 453.6), "lbs": ("g", 453.6), "pound": ("g", 453.6), "pounds": ("g", 453.6),
+    "ml": ("ml", 1), "milliliter": ("ml", 1), "milliliters": ("ml", 1), "millilitre": ("ml", 1),
+    "l": ("ml", 1000), "liter": ("ml", 1000), "liters": ("ml", 1000), "litre": ("ml", 1000),
+    "cup": ("ml", 240), "cups": ("ml", 240),
+    "tbsp": ("ml", 15), "tablespoon": ("ml", 15), "tablespoons": ("ml", 15),
+    "tsp": ("ml", 5), "teaspoon": ("ml", 5), "teaspoons": ("ml", 5),
+    "whole": ("", 1), "piece": ("", 1), "pieces": ("", 1), "medium": ("", 1), "large": ("", 1),
+    "small": ("", 1),
+    "clove": ("clove", 1), "cloves": ("clove", 1),
+    "slice": ("slice", 1), "slices": ("slice", 1),
+    "can": ("can", 1), "cans": ("can", 1),
+    "handful": ("handful", 1), "handfuls": ("handful", 1),
+}
+
+# Store section -> keywords matched against the ingredient name; first match wins
+SECTIONS = OrderedDict([
+    ("Produce", ("eggplant", "green bean", "apple", "banana", "berr", "lemon", "lime", "orange", "avocado",
+                 "tomato", "spinach", "kale", "lettuce", "broccoli", "carrot", "onion", "garlic", "pepper", "cucumber",
+                 "zucchini", "potato", "mushroom", "celery", "cabbage", "herb", "parsley", "basil",
+                 "cilantro", "ginger", "fruit", "vegetable", "greens", "asparagus", "squash")),
+    ("Meat & Seafood", ("chicken", "turkey", "beef", "pork", "lamb", "salmon", "tuna", "cod", "fish",
+                        "shrimp", "prawn", "steak", "mince")),
+    ("Dairy & Eggs", ("egg", "milk", "yogurt", "yoghurt", "cheese", "butter", "cream", "kefir", "feta")),
+    ("Bakery & Grains", ("bread", "tortilla", "wrap", "pita", "bagel", "rice", "oat", "quinoa", "pasta",
+                         "noodle", "couscous", "barley", "granola", "cereal")),
+    ("Plant Proteins", ("tofu", "tempeh", "seitan", "lentil", "chickpea", "bean", "edamame", "hummus")),
+    ("Pantry", ("oil", "vinegar", "salt", "spice", "cumin", "paprika", "cinnamon", "honey", "syrup",
+                "sauce", "stock", "broth", "flour", "nut", "almond", "walnut", "seed", "peanut",
+                "raisin", "date", "chocolate", "protein powder", "mustard")),
+    ("Frozen", ("frozen",)),
+])
+OTHER_SECTION = "Other"
+
+# Preparation words that don't change what gets bought
+PREPARATION_WORDS = {"chopped", "diced", "sliced", "minced", "grated", "fresh", "cooked", "raw", "boneless",
+                     "skinless", "shredded", "steamed", "roasted", "grilled", "boiled", "peeled", "dried"}
+# Names that read wrong singularized
+PLURAL_NAMES = {"oats", "greens", "grits", "lentils", "sprouts"}
+
+_VULGAR_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75}
+_LINE = re.compile(
+    r"^\s*[-*•]\s*(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?\s*[½⅓⅔¼¾]?|[½⅓⅔¼¾])\s*"
+    r"(?P<rest>[A-Za-z].*?)\s*$"
+)
+_HEADING = re.compile(r"^\W*ingredients\W*$", re.IGNORECASE)
+
+
+def parse_quantity(text: str) -> float:
+    text = text.strip()
+    total = 0.0
+    for char, value in _VULGAR_FRACTIONS.items():
+        if char in text:
+            total += value
+            text = text.replace(char, "").strip()
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator) if float(denominator) else 0.0
+        else:
+            total += float(part)
+    return total
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, drop parenthesised notes and preparation words, and singularize simple plurals"""
+    name = re.sub(r"\(.*?\)", "", name.lower()).split(",")[0]
+    words = [word for word in re.findall(r"[a-z][a-z'-]*", name) if word not in PREPARATION_WORDS]
+    if words and words[0] == "of":
+        words = words[1:]
+    if words and words[-1] not in PLURAL_NAMES:
+        last = words[-1]
+        if last.endswith("ies") and len(last) > 4:
+            words[-1] = last[:-3] + "y"
+        elif last.endswith("oes"):
+            words[-1] = last[:-2]
+        elif last.endswith("s") and not last.endswith(("ss", "us")) and len(last) > 3:
+            words[-1] = last[:-1]
+    return " ".join(words)
+
+
+def parse_ingredients(text: str) -> List[Dict[str, Any]]:
+    """
+    Ingredient lines from the "Ingredients:" blocks of a meal plan.
+
+    Returns {"name", "quantity", "unit"} dicts with quantities converted to
+    the canonical unit (g, ml or a count). Lines that don't match the format
+    are skipped rather than guessed at.
+    """
+    ingredients = []
+    in_block = False
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            in_block = True
+            continue
+        if not in_block:
+            continue
+        if not line.strip():
+            continue
+        match = _LINE.match(line)
+        if match is None:
+            # Anything other than another ingredient line ends the block
+            in_block = False
+            continue
+        words = match.group("rest").split(maxsplit=1)
+        unit, factor = UNITS.get(words[0].lower().rstrip("."), (None, 1))
+        name = words[1] if unit is not None and len(words) > 1 else match.group("rest")
+        name = normalize_name(name)
+        if name:
+            ingredients.append({
+                "name": name,
+                "quantity": parse_quantity(match.group("quantity")) * factor,
+                "unit": unit or "",
+            })
+    return ingredients
+
+
+def section_for(name: str) -> str:
+    for section, keywords in SECTIONS.items():
+        if any(keyword in name for keyword in keywords):
+            return section
+    return OTHER_SECTION
+
+
+def _display(quantity: float, unit: str) -> Dict[str, Any]:
+    if unit in ("g", "ml") and quantity >= 1000:
+        quantity, unit = quantity / 1000, "kg" if unit == "g" else "l"
+    rounded = round(quantity, 1) if quantity < 10 else round(quantity)
+    if unit in ("clove", "slice", "can", "handful") and rounded != 1:
+        unit += "s"
+    return {"quantity": int(rounded) if rounded == int(rounded) else rounded, "unit": unit}
+
+
+def aggregate(ingredients: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Sum duplicate ingredients per unit and group them by store section, in SECTIONS order"""
+    totals: Dict[tuple, float] = {}
+    for ingredient in ingredients:
+        key = (ingredient["name"], ingredient["unit"])
+        totals[key] = totals.get(key, 0.0) + ingredient["quantity"]
+
+    grouped: Dict[str, List[Dict[str, Any]]] = {section: [] for section in list(SECTIONS) + [OTHER_SECTION]}
+    for (name, unit), quantity in sorted(totals.items()):
+        grouped[section_for(name)].append(dict(item=name, **_display(quantity, unit)))
+    return {section: items for section, items in grouped.items() if items}
+
+
+def render_shopping_list(sections: Dict[str, List[Dict[str, Any]]], title: Optional[str] = None) -> str:
+    lines = [f"# {title or 'Shopping List'}"]
+    for section, items in sections.items():
+        lines.append(f"\n## {section}")
+        for item in items:
+            amount = f"{item['quantity']} {item['unit']}".strip()
+            lines.append(f"- {item['item']}: {amount}")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+import difflib
+import json
+import os
+import re
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .nutrient_db import NUTRIENTS, nutrient_db
+from .shopping_list import normalize_name
+
+SUBSTITUTIONS_PATH = os.getenv(
+    "SUBSTITUTIONS_PATH", os.path.join(os.path.dirname(__file__), "data", "substitutions.json")
+)
+# Fuzzy food matches below this similarity go to the model instead
+MIN_MATCH_SCORE = 0.85
+
+# Phrase in a dietary restriction -> tags every suggested alternative must carry
+RESTRICTION_PHRASES = {
+    "vegan": {"vegan"}, "plant-based": {"vegan"}, "plant based": {"vegan"},
+    "vegetarian": {"vegetarian"},
+    "dairy-free": {"dairy-free"}, "dairy free": {"dairy-free"}, "dairy": {"dairy-free"},
+    "lactose": {"lactose-free"},
+    "gluten-free": {"gluten-free"}, "gluten free": {"gluten-free"}, "gluten": {"gluten-free"},
+    "celiac": {"gluten-free"}, "coeliac": {"gluten-free"}, "wheat": {"gluten-free"},
+    "nut-free": {"nut-free"}, "nut free": {"nut-free"}, "nut": {"nut-free"}, "nuts": {"nut-free"},
+    "peanut": {"nut-free"}, "tree nut": {"nut-free"},
+    "egg-free": {"egg-free"}, "egg free": {"egg-free"}, "egg": {"egg-free"}, "eggs": {"egg-free"},
+    "soy-free": {"soy-free"}, "soy free": {"soy-free"}, "soy": {"soy-free"},
+    "low-fodmap": {"low-fodmap"}, "low fodmap": {"low-fodmap"}, "fodmap": {"low-fodmap"}, "ibs": {"low-fodmap"},
+    "keto": {"low-carb"}, "low-carb": {"low-carb"}, "low carb": {"low-carb"},
+}
+# Words that can surround a restriction without changing it
+FILLER_WORDS = {"a", "and", "or", "the", "diet", "no", "free", "friendly", "intolerance", "intolerant",
+                "allergy", "allergies", "allergic", "sensitivity", "restriction", "restrictions", "with", "to",
+                "i'm", "im", "am", "i", "have", "an", "none", "any", "healthy", "healthier", "general", "option"}
+# Tags implied by other tags
+IMPLIED_TAGS = {"vegan": {"vegetarian", "dairy-free", "egg-free"}, "dairy-free": {"lactose-free"}}
+
+_PHRASE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(RESTRICTION_PHRASES, key=len, reverse=True)) + r")\b"
+)
+
+
+def parse_restriction(text: str) -> Optional[FrozenSet[str]]:
+    """Tags a free-text dietary restriction requires, or None when part of it isn't understood"""
+    text = str(text or "").lower()
+    tags = set()
+    for phrase in _PHRASE_PATTERN.findall(text):
+        tags |= RESTRICTION_PHRASES[phrase]
+    leftover = set(re.findall(r"[a-z'-]+", _PHRASE_PATTERN.sub(" ", text))) - FILLER_WORDS
+    return None if leftover else frozenset(tags)
+
+
+class SubstitutionIndex:
+    """
+    Precomputed food substitutions keyed by normalized food name.
+
+    Each alternative carries restriction tags (vegan, gluten-free, nut-free,
+    low-fodmap, ...) and its nutrient difference from the original per 100 g,
+    computed once at load from the nutrient table. A lookup is a dictionary
+    hit plus a subset test per alternative; only names that aren't known
+    aliases go through fuzzy matching.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], aliases: Dict[str, int]):
+        self.entries = entries
+        self.aliases = aliases
+        self._alias_keys = list(aliases)
+
+    @classmethod
+    def load(cls, path: str = SUBSTITUTIONS_PATH) -> "SubstitutionIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        entries, aliases = [], {}
+        for index, (food, entry) in enumerate(data.items()):
+            for alias in [food] + entry.get("aliases", []):
+                aliases.setdefault(normalize_name(alias), index)
+            alternatives = []
+            for alternative in entry["alternatives"]:
+                tags = set(alternative["tags"])
+                for tag in list(tags):
+                    tags |= IMPLIED_TAGS.get(tag, set())
+                alternatives.append(dict(alternative, tags=frozenset(tags)))
+            entries.append({"food": food, "alternatives": alternatives})
+        cls._attach_deltas(entries)
+        return cls(entries, aliases)
+
+    @staticmethod
+    def _attach_deltas(entries: List[Dict[str, Any]]):
+        """Nutrient difference (alternative - original, per 100 g) for every pair the nutrient table knows"""
+        pairs = [
+            (alternative, nutrient_db.lookup(entry["food"]), nutrient_db.lookup(alternative["name"]))
+            for entry in entries for alternative in entry["alternatives"]
+        ]
+        known = [(alternative, original, row) for alternative, original, row in pairs
+                 if original is not None and row is not None]
+        if not known:
+            return
+        originals = np.array([original for _, original, _ in known], dtype=np.intp)
+        rows = np.array([row for _, _, row in known], dtype=np.intp)
+        deltas = nutrient_db.per_100g[rows] - nutrient_db.per_100g[originals]
+        for (alternative, _, _), delta in zip(known, deltas):
+            alternative["per_100g_delta"] = {n: round(float(v), 1) for n, v in zip(NUTRIENTS, delta)}
+
+    def match(self, food: str) -> Tuple[Optional[int], float]:
+        """(entry index, similarity) of the closest known food; similarity 1.0 for an exact alias"""
+        name = normalize_name(food)
+        if name in self.aliases:
+            return self.aliases[name], 1.0
+        best, score = None, 0.0
+        for candidate in difflib.get_close_matches(name, self._alias_keys, n=1, cutoff=MIN_MATCH_SCORE):
+            best, score = self.aliases[candidate], difflib.SequenceMatcher(None, name, candidate).ratio()
+        return best, score
+
+    def lookup(self, food: str, restriction: str) -> Optional[Dict[str, Any]]:
+        """Alternatives to food that satisfy restriction, or None when the index can't answer confidently"""
+        required = parse_restriction(restriction)
+        if required is None:
+            return None
+        index, score = self.match(food)
+        if index is None:
+            return None
+        entry = self.entries[index]
+        alternatives = [
+            {key: (sorted(value) if key == "tags" else value) for key, value in alternative.items()}
+            for alternative in entry["alternatives"] if required <= alternative["tags"]
+        ]
+        if not alternatives:
+            return None
+        return {"food": entry["food"], "match_score": round(score, 2), "required_tags": sorted(required),
+                "alternatives": alternatives}
+
+
+def render_substitutions(result: Dict[str, Any], restriction: str) -> str:
+    lines = [f"Alternatives to {result['food']} for a {restriction} diet:"]
+    for number, alternative in enumerate(result["alternatives"], 1):
+        lines.append(f"\n{number}. **{alternative['name'].capitalize()}** ({', '.join(alternative['tags'])})")
+        delta = alternative.get("per_100g_delta")
+        if delta:
+            lines.append(
+                f"   - Per 100 g vs {result['food']}: {delta['kcal']:+.0f} kcal, protein {delta['protein_g']:+} g, "
+                f"carbs {delta['carbs_g']:+} g, fat {delta['fat_g']:+} g, fiber {delta['fiber_g']:+} g"
+            )
+        lines.append(f"   - How to use: {alternative['use']}")
+        lines.append(f"   - Taste and texture: {alternative['taste']}")
+    return "\n".join(lines)
+
+
+substitution_index = SubstitutionIndex.load()
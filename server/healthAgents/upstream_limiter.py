@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from . import metrics
+from .deadlines import DeadlineExceeded, remaining_time
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamBusy(Exception):
+    """
+    The upstream LLM can't take this call right now.
+
+    status_code is 429 when a rate limit (ours or the provider's) is the
+    reason and 503 when every upstream slot stayed busy for the whole queue
+    wait. retry_after is a hint in seconds for the client.
+    """
+
+    def __init__(self, message: str, retry_after: float, status_code: int = 503):
+        super().__init__(message)
+        self.retry_after = max(1.0, retry_after)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to one minute's worth of a per-minute limit"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount is available, without taking it"""
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.per_minute)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def reserve(self, amount: float):
+        """Take amount now, going into debt that later callers wait out"""
+        if self.per_minute > 0:
+            self._refill()
+            self.tokens -= min(amount, self.per_minute)
+
+    def refund(self, amount: float):
+        if self.per_minute > 0 and amount > 0:
+            self._refill()
+            self.tokens = min(self.per_minute, self.tokens + amount)
+
+
+class UpstreamLimiter:
+    """
+    Central gate in front of every async upstream LLM call.
+
+    A call first reserves one request and its estimated tokens (prompt plus
+    max_tokens) from its model's per-minute buckets, since the provider limits
+    each model separately, waiting out any debt. It then waits for one of
+    max_in_flight slots. The whole wait is bounded by max_queue_wait and at
+    most max_queued calls wait at once; past either limit the call fails fast
+    with UpstreamBusy instead of piling up. When the request's deadline comes
+    before max_queue_wait it bounds the wait instead, and running out of it
+    raises DeadlineExceeded. Unused reserved tokens are refunded once the real
+    usage is known, and a 429 from the provider pauses new calls for its
+    Retry-After.
+    """
+
+    def __init__(self, max_in_flight: int = 16, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_queue_wait: float = 10.0, max_queued: int = 256,
+                 model_limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.max_queued = max_queued
+        # Limits of 0 disable a bucket; model_limits overrides them per model id
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self._paused_until = 0.0
+        self.in_flight = 0
+        self.queued = 0
+        self.rejections = {"queue_full": 0, "rate_limited": 0, "queue_timeout": 0, "upstream_429": 0, "deadline": 0}
+
+    def _buckets_for(self, model_id: str) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(model_id)
+        if buckets is None:
+            limits = self.model_limits.get(model_id, {})
+            buckets = self._buckets[model_id] = (
+                TokenBucket(limits.get("requests_per_minute", self.requests_per_minute)),
+                TokenBucket(limits.get("tokens_per_minute", self.tokens_per_minute)),
+            )
+        return buckets
+
+    @asynccontextmanager
+    async def slot(self, model_id: str, estimated_tokens: int):
+        """Hold an upstream slot for one call; yields a reservation to settle with actual usage"""
+        if self.queued >= self.max_queued:
+            self._reject("queue_full")
+            raise UpstreamBusy("Too many requests are waiting for the model", self.max_queue_wait, 503)
+
+        # A request's deadline shortens the wait: no point queueing for a call it can't use
+        remaining = remaining_time()
+        deadline_bound = remaining is not None and remaining < self.max_queue_wait
+        max_wait = remaining if deadline_bound else self.max_queue_wait
+
+        requests, tokens = self._buckets_for(model_id)
+        pause = self._paused_until - time.monotonic()
+        delay = max(pause, requests.delay_for(1), tokens.delay_for(estimated_tokens))
+        if delay > max_wait:
+            if deadline_bound:
+                self._reject("deadline")
+                raise DeadlineExceeded()
+            self._reject("rate_limited")
+            raise UpstreamBusy("Upstream rate limit reached", delay, 429)
+        requests.reserve(1)
+        tokens.reserve(estimated_tokens)
+        reservation = {"tokens": estimated_tokens}
+
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._semaphore is not None:
+                left = max_wait - (time.monotonic() - started)
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), max(left, 0.001))
+                except asyncio.TimeoutError:
+                    if deadline_bound:
+                        self._reject("deadline")
+                        raise DeadlineExceeded() from None
+                    self._reject("queue_timeout")
+                    raise UpstreamBusy("All upstream slots are busy", self.max_queue_wait, 503) from None
+        except BaseException:
+            # Never sent, so give the reservation back
+            self.queued -= 1
+            requests.refund(1)
+            tokens.refund(estimated_tokens)
+            raise
+        self.queued -= 1
+        metrics.upstream_queue_seconds.observe(time.monotonic() - started)
+
+        self.in_flight += 1
+        try:
+            yield reservation
+        finally:
+            self.in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+            actual = reservation.get("actual_tokens")
+            if actual is not None:
+                tokens.refund(estimated_tokens - actual)
+
+    def rate_limited_upstream(self, retry_after: Optional[float]) -> UpstreamBusy:
+        """Record a provider 429 and pause new calls until it should have cleared"""
+        retry_after = retry_after if retry_after and retry_after > 0 else 60.0 / max(self.requests_per_minute, 1)
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self._reject("upstream_429")
+        return UpstreamBusy("The model provider is rate limiting requests", retry_after, 429)
+
+    def _reject(self, reason: str):
+        self.rejections[reason] += 1
+        metrics.upstream_rejections.inc(reason)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "max_queue_wait": self.max_queue_wait,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "model_limits": self.model_limits,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "rejections": dict(self.rejections),
+        }
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Retry-After of a provider 429 (or the error it was raised from), if it is one"""
+    for candidate in (error, error.__cause__):
+        if candidate is None or getattr(candidate, "status_code", None) != 429:
+            continue
+        response = getattr(candidate, "response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(header) if header else 0.0
+        except ValueError:
+            return 0.0
+    return None
+
+
+def create_upstream_limiter() -> UpstreamLimiter:
+    """
+    Limiter configured from UPSTREAM_* settings. Set the per-minute limits to
+    the account's provider limits; UPSTREAM_MODEL_LIMITS takes JSON like
+    {"llama-3.3-70b-versatile": {"requests_per_minute": 30, "tokens_per_minute": 6000}}.
+    """
+    model_limits = {}
+    configured = os.getenv("UPSTREAM_MODEL_LIMITS")
+    if configured:
+        try:
+            model_limits = json.loads(configured)
+        except ValueError as e:
+            logger.warning("Ignoring UPSTREAM_MODEL_LIMITS, not valid JSON: %s", e)
+    return UpstreamLimiter(
+        max_in_flight=int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "16")),
+        requests_per_minute=float(os.getenv("UPSTREAM_REQUESTS_PER_MINUTE", "0")),
+        tokens_per_minute=float(os.getenv("UPSTREAM_TOKENS_PER_MINUTE", "0")),
+        max_queue_wait=float(os.getenv("UPSTREAM_MAX_QUEUE_WAIT", "10")),
+        max_queued=int(os.getenv("UPSTREAM_MAX_QUEUED", "256")),
+        model_limits=model_limits,
+    )
+
+
+upstream_limiter = create_upstream_limiter()
@@ -1,4 +1,6 @@
+from . import metrics
 from .base_agent import BaseAgent
+from .exercise_library import exercise_library, render_alternatives
 
 
 class WorkoutPlanAgent(BaseAgent):
@@ -19,7 +21,7 @@ class WorkoutPlanAgent(BaseAgent):
             "Sport-Specific"
         ]
 
-    def generate_workout_plan(self, user_profile):
+    async def generate_workout_plan(self, user_profile):
         """
         Generate a personalized workout plan based on user profile
         
@@ -31,7 +33,14 @@ class WorkoutPlanAgent(BaseAgent):
         - frequency: workouts per week
         - limitations: any injuries or conditions
         """
-        prompt = f"""
+        return await self.aget_response(self._workout_plan_prompt(user_profile), operation="generate_workout_plan")
+
+    def stream_workout_plan(self, user_profile):
+        """Stream the workout plan as it is generated"""
+        return self.astream_response(self._workout_plan_prompt(user_profile), operation="generate_workout_plan")
+
+    def _workout_plan_prompt(self, user_profile):
+        return f"""
         Create a personalized workout plan based on the following profile:
         
         Fitness Level: {user_profile.get('fitness_level', 'Not specified')}
@@ -40,6 +49,7 @@ class WorkoutPlanAgent(BaseAgent):
         Time Available: {user_profile.get('time_available', 'Not specified')} minutes per session
         Frequency: {user_profile.get('frequency', 'Not specified')} workouts per week
         Limitations/Injuries: {user_profile.get('limitations', 'None mentioned')}
+        {f"Health Assessment: {user_profile['health_assessment']}" if user_profile.get('health_assessment') else ""}
         
         The workout plan should include:
         1. A weekly schedule
@@ -50,10 +60,19 @@ class WorkoutPlanAgent(BaseAgent):
         
         Format the response in a clear, motivational way that's easy to follow.
         """
-        return self.get_response(prompt)
     
-    def suggest_exercise_alternatives(self, exercise, equipment=None, difficulty=None):
-        """Suggest alternative exercises for a given exercise"""
+    async def suggest_exercise_alternatives(self, exercise, equipment=None, difficulty=None):
+        """
+        Suggest alternative exercises for a given exercise.
+        Exercises in the local library are answered from its indexes; the
+        model is only asked about the rest.
+        """
+        result = exercise_library.alternatives(exercise, equipment, difficulty)
+        if result is not None:
+            metrics.local_answers.inc("suggest_exercise_alternatives", "index")
+            return {"response": render_alternatives(result), "source": "index",
+                    "alternatives": result["alternatives"]}
+        metrics.local_answers.inc("suggest_exercise_alternatives", "model")
         prompt = f"""
         Suggest 3-5 alternative exercises for {exercise} that target the same muscle groups.
         
@@ -66,9 +85,10 @@ class WorkoutPlanAgent(BaseAgent):
         3. Primary and secondary muscles worked
         4. Relative difficulty compared to the original exercise
         """
-        return self.get_response(prompt)
+        return {"response": await self.aget_response(prompt, operation="suggest_exercise_alternatives"),
+                "source": "model"}
     
-    def create_quick_workout(self, time_available, focus_area, equipment=None):
+    async def create_quick_workout(self, time_available, focus_area, equipment=None):
         """Create a quick workout when time is limited"""
         prompt = f"""
         Create a time-efficient {time_available}-minute workout focusing on {focus_area}.
@@ -81,10 +101,18 @@ class WorkoutPlanAgent(BaseAgent):
         
         Make it intense but achievable, with minimal transition time between exercises.
         """
-        return self.get_response(prompt)
+        return await self.aget_response(prompt, operation="create_quick_workout")
     
-    def provide_form_guidance(self, exercise):
-        """Provide detailed form guidance for a specific exercise"""
+    async def provide_form_guidance(self, exercise):
+        """
+        Provide detailed form guidance for a specific exercise.
+        Library exercises get their precomputed guide without calling the model.
+        """
+        guide = exercise_library.form_guide(exercise)
+        if guide is not None:
+            metrics.local_answers.inc("provide_form_guidance", "index")
+            return {"response": guide["guide"], "source": "index", "exercise": guide["exercise"]}
+        metrics.local_answers.inc("provide_form_guidance", "model")
         prompt = f"""
         Provide detailed form guidance for performing {exercise} correctly and safely.
         
@@ -98,4 +126,5 @@ class WorkoutPlanAgent(BaseAgent):
         
         Format this as a clear instructional guide.
         """
-        return self.get_response(prompt) 
\ No newline at end of file
+        return {"response": await self.aget_response(prompt, operation="provide_form_guidance"),
+                "source": "model"}
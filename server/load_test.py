@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Load test every agent route of the FastAPI server or the Flask backend.
+
+Run the app against the fake LLM, then drive it at a fixed concurrency:
+
+    python fake_groq_server.py --port 9000 &
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake uvicorn main:app --port 8000 &
+    python load_test.py --target server --base-url http://127.0.0.1:8000 \\
+        --concurrency 32 --requests 200 --output results/server.json
+
+Per-route throughput, p50/p95/p99 latency (plus time to first event for
+streamed routes) and errors are printed and saved as JSON. Errors reported
+inside a 200 response (a stream's error event, a failed batch operation) are
+counted separately from failed requests and excluded from the latencies.
+Pass --compare with an earlier results file to flag p95 and error rate
+regressions; the exit status is 1 when any are found.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+SAMPLE_USER = {
+    "user_id": "loadtest_user",
+    "assessment_date": "2025-07-05T20:31:08.496Z",
+    "age": 27,
+    "height": 152,
+    "weight": 62,
+    "gender": "male",
+    "activity_level": "sedentary",
+    "medical_conditions": ["Back Problems"],
+    "medications": "Gastric Medicines, Paracetamols",
+    "injuries": "nothing",
+    "goals": ["muscle-gain"],
+    "preferred_activities": ["Strength Training"],
+    "dietary_preferences": ["Gluten-Free", "Dairy-Free"],
+    "time_availability": "15-30",
+    "equipment": ["No Equipment"],
+    "sleep_quality": "average",
+    "stress_level": "moderate",
+    "energy_levels": "good",
+    "work_type": "office",
+}
+
+WORKOUT_PROFILE = {
+    "fitness_level": "beginner",
+    "goals": "muscle gain",
+    "available_equipment": "dumbbells",
+    "time_available": 30,
+    "frequency": 3,
+    "limitations": "lower back pain",
+}
+
+NUTRITION_PROFILE = {
+    "age": 27,
+    "weight": 62,
+    "height": 152,
+    "activity_level": "sedentary",
+    "dietary_preferences": "gluten-free, dairy-free",
+    "allergies": "peanuts",
+    "goal": "muscle gain",
+}
+
+# Routes shared by both apps, with the payloads the frontend sends
+COMMON_ROUTES = {
+    "/api/health/profile/greet": {"user_type": "new_user"},
+    "/api/health/profile/suggest-program": {"health_interest": "better sleep"},
+    "/api/health/profile/assessment": {"user_info": SAMPLE_USER},
+    "/api/health/workout/plan": {"user_profile": WORKOUT_PROFILE},
+    "/api/health/workout/alternatives": {"exercise": "barbell squat", "equipment": "dumbbells", "difficulty": "beginner"},
+    "/api/health/workout/quick": {"time_available": "20", "focus_area": "core", "equipment": "none"},
+    "/api/health/workout/form-guidance": {"exercise": "deadlift"},
+    "/api/health/nutrition/meal-plan": {"user_profile": NUTRITION_PROFILE},
+    "/api/health/nutrition/food-alternatives": {"food": "cow's milk", "dietary_restriction": "dairy-free"},
+    "/api/health/nutrition/analyze-meal": {"meal_description": "2 eggs, 1 slice whole wheat toast and a banana"},
+    "/api/health/nutrition/tips": {"goal": "muscle gain"},
+    "/api/health/progress/analyze": {"user_data": {
+        "time_period": "8 weeks",
+        "current_metrics": {"weight": 64, "squat_kg": 60},
+        "starting_metrics": {"weight": 62, "squat_kg": 40},
+        "goals": "muscle gain",
+        "challenges": "late work nights",
+    }},
+    "/api/health/progress/adjustments": {"current_plan": "3x full body per week", "progress_data": "strength stalled for 2 weeks"},
+    "/api/health/progress/milestone-plan": {"goal": "run a 10k", "current_status": "can run 3k", "timeframe": "3 months"},
+    "/api/health/progress/plateau": {"plateau_data": "weight unchanged for 4 weeks despite calorie deficit"},
+    "/api/health/progress/celebrate": {"achievement": "first unassisted pull-up"},
+    "/api/health/info/explain-concept": {"concept": "progressive overload"},
+    "/api/health/info/answer-question": {"question": "How much protein do I need to build muscle?"},
+    "/api/health/info/debunk-myth": {"myth": "Lifting weights makes women bulky"},
+    "/api/health/info/research": {"research_topic": "intermittent fasting"},
+    "/api/health/info/educational-content": {"topic": "sleep hygiene", "format_type": "article"},
+    "/api/health/info/compare": {"approach1": "HIIT", "approach2": "steady-state cardio", "goal": "fat loss"},
+}
+
+SERVER_ROUTES = dict(COMMON_ROUTES, **{
+    "/api/health/nutrition/shopping-list": {"dietary_preference": "vegan", "days": 7},
+    "/api/health/profile/dynamic-greeting": {"user_context": {"name": "Sam", "time_of_day": "morning", "goals": ["muscle-gain"], "visit_count": 3}},
+    "/api/health/profile/intelligent-assessment": {"user_data": SAMPLE_USER},
+    "/api/health/profile/adaptive-program": {"user_context": {"primary_goal": "muscle gain", "fitness_level": "beginner", "available_time": "30 minutes"}},
+    "/api/health/profile/progress-guidance": {"user_id": "loadtest_user", "query": "How should I adjust this week?"},
+    "/api/health/workout/plan/stream": {"user_profile": WORKOUT_PROFILE},
+    "/api/health/nutrition/meal-plan/stream": {"user_profile": NUTRITION_PROFILE},
+    "/api/health/info/educational-content/stream": {"topic": "sleep hygiene", "format_type": "article"},
+    "/api/health/profile/intelligent-assessment/stream": {"user_data": SAMPLE_USER},
+    "/api/health/onboarding": {"user_profile": SAMPLE_USER},
+    "/api/health/batch": {"operations": [
+        {"operation": "profile/greet", "arguments": {"user_type": "new_user"}},
+        {"operation": "workout/plan", "arguments": {"user_profile": WORKOUT_PROFILE}},
+        {"operation": "nutrition/meal-plan", "arguments": {"user_profile": NUTRITION_PROFILE}},
+    ]},
+})
+
+BACKEND_ROUTES = dict(COMMON_ROUTES, **{
+    "/api/health/nutrition/shopping-list": {"dietary_preferences": "vegan", "days": 7},
+})
+
+TARGETS = {"server": SERVER_ROUTES, "backend": BACKEND_ROUTES}
+
+STREAMING_ROUTES = {path for path in SERVER_ROUTES if path.endswith("/stream")} | {"/api/health/onboarding"}
+# Routes answering 200 with per-operation errors in results[*].error
+BATCH_ROUTES = {"/api/health/batch"}
+
+
+def vary_payload(payload, i):
+    """Make the first string field unique so the response cache can't answer the request"""
+    payload = copy.deepcopy(payload)
+
+    def visit(node):
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, value in items:
+            if isinstance(value, str):
+                node[key] = f"{value} (variant {i})"
+                return True
+            if isinstance(value, (dict, list)) and visit(value):
+                return True
+        return False
+
+    visit(payload)
+    return payload
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def timed_request(client, path, payload):
+    """
+    Return (outcome, total_seconds, first_event_seconds). outcome is "ok",
+    "error" for a non-200 response, or "embedded_error" for a 200 whose body
+    reports a failure: a stream with an error event or a batch with a failed
+    operation.
+    """
+    started = time.perf_counter()
+    if path in STREAMING_ROUTES:
+        first_event = None
+        failed = False
+        async with client.stream("POST", path, json=payload) as response:
+            async for line in response.aiter_lines():
+                if first_event is None and line.startswith("data:"):
+                    first_event = time.perf_counter() - started
+                if line.startswith("event:") and line[len("event:"):].strip() == "error":
+                    failed = True
+            status = response.status_code
+        return _outcome(status, failed), time.perf_counter() - started, first_event
+    response = await client.post(path, json=payload)
+    failed = False
+    if response.status_code == 200 and path in BATCH_ROUTES:
+        failed = any(result.get("error") for result in response.json().get("results", []))
+    return _outcome(response.status_code, failed), time.perf_counter() - started, None
+
+
+def _outcome(status_code, failed):
+    if status_code != 200:
+        return "error"
+    return "embedded_error" if failed else "ok"
+
+
+async def run_route(client, path, payload, requests, concurrency, unique):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_events = [], []
+    errors = embedded_errors = 0
+
+    async def one(i):
+        nonlocal errors, embedded_errors
+        async with semaphore:
+            try:
+                outcome, elapsed, first_event = await timed_request(
+                    client, path, vary_payload(payload, i) if unique else payload
+                )
+            except (httpx.HTTPError, ValueError):
+                outcome, elapsed, first_event = "error", None, None
+            if outcome == "ok":
+                latencies.append(elapsed)
+                if first_event is not None:
+                    first_events.append(first_event)
+            elif outcome == "embedded_error":
+                embedded_errors += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "embedded_errors": embedded_errors,
+        "error_rate": round((errors + embedded_errors) / requests, 4) if requests else 0.0,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean": round(statistics.mean(latencies), 4) if latencies else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+    if first_events:
+        result["first_event_p50"] = percentile(first_events, 50)
+        result["first_event_p95"] = percentile(first_events, 95)
+    return result
+
+
+def compare(current, baseline, threshold, max_error_rate):
+    """
+    Return a list of (path, metric, before, after) for routes whose p95 got
+    worse than the threshold allows, or whose error rate rose above both the
+    baseline's and max_error_rate.
+    """
+    regressions = []
+    for path, stats in current["routes"].items():
+        before = baseline.get("routes", {}).get(path) or {}
+        error_rate = stats.get("error_rate", 0.0)
+        if error_rate > max(before.get("error_rate", 0.0), max_error_rate):
+            regressions.append((path, "error_rate", before.get("error_rate"), error_rate))
+        if not before.get("p95") or not stats.get("p95"):
+            continue
+        change = (stats["p95"] - before["p95"]) / before["p95"]
+        if change > threshold:
+            regressions.append((path, "p95", before["p95"], stats["p95"]))
+    return regressions
+
+
+async def run_suite(args):
+    routes = TARGETS[args.target]
+    if args.routes:
+        routes = {path: payload for path, payload in routes.items() if any(r in path for r in args.routes)}
+
+    results = {
+        "target": args.target,
+        "base_url": args.base_url,
+        "started_at": datetime.now().isoformat(),
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "unique_payloads": args.unique,
+        "python": platform.python_version(),
+        "routes": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"{'route':<52} {'rps':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'ttfe':>7} {'err':>5} {'in200':>5}")
+        for path, payload in routes.items():
+            stats = await run_route(client, path, payload, args.requests, args.concurrency, args.unique)
+            results["routes"][path] = stats
+            print(f"{path:<52} {stats['throughput_rps']:>8} {_fmt(stats['p50'])} {_fmt(stats['p95'])} "
+                  f"{_fmt(stats['p99'])} {_fmt(stats.get('first_event_p50'))} {stats['errors']:>5} "
+                  f"{stats['embedded_errors']:>5}")
+    return results
+
+
+def _fmt(value):
+    return f"{value:>7.3f}" if value is not None else f"{'-':>7}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(TARGETS), default="server")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--routes", nargs="*", help="only run routes containing one of these substrings")
+    parser.add_argument("--unique", action="store_true", help="vary payloads to defeat response caching")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write results JSON to this path")
+    parser.add_argument("--compare", help="earlier results JSON to check for p95 and error rate regressions")
+    parser.add_argument("--regression-threshold", type=float, default=0.10,
+                        help="allowed relative p95 increase before a route is flagged")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="error rate, counting errors reported inside 200 responses, above which a "
+                             "route is flagged unless the baseline was already as bad")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(args))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.regression_threshold, args.max_error_rate)
+        if regressions:
+            print("\n=== Regressions ===")
+            for path, metric, before, after in regressions:
+                if metric == "p95":
+                    print(f"{path}: p95 {before:.3f}s -> {after:.3f}s (+{(after - before) / before:.0%})")
+                else:
+                    print(f"{path}: error rate {before or 0:.1%} -> {after:.1%}")
+            sys.exit(1)
+        print("\nNo p95 or error rate regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
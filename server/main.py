@@ -1,11 +1,17 @@
+import asyncio
+import inspect
+import json
+import math
+import os
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 # from fastapi import FastAPI, HTTPException, Request, Response, Depends
 # from fastapi.security import HTTPAuthorizationCredentials, HTTPBeare
-from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from pydantic import BaseModel, ValidationError
+from typing import Callable, Dict, List, Optional, Any
 from healthAgents import (
     HealthProfileAgent,
     WorkoutPlanAgent, 
@@ -13,6 +19,15 @@ from healthAgents import (
     ProgressTrackingAgent,
     HealthInfoAgent
 )
+from healthAgents import metrics
+from healthAgents.deadlines import DeadlineExceeded
+from healthAgents.hedging import hedger
+from healthAgents.orchestrator import build_onboarding_pipeline
+from healthAgents.output_budget import output_budget
+from healthAgents.request_context import current_route, request_deadline, requested_detail, requested_model_tier
+from healthAgents.prompt_compaction import compaction_stats
+from healthAgents.response_cache import response_cache
+from healthAgents.upstream_limiter import UpstreamBusy, upstream_limiter
 
 
 app = FastAPI(title="Health AI Agents API", version="1.0.0")
@@ -25,6 +40,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    # Label by known route paths only so unknown URLs can't blow up metric cardinality
+    route = request.url.path if request.url.path in KNOWN_ROUTES else "unmatched"
+    current_route.set(route)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        metrics.http_requests.inc(route, request.method, "500")
+        metrics.http_errors.inc(route, type(e).__name__)
+        raise
+    finally:
+        metrics.http_request_seconds.observe(time.perf_counter() - started, route)
+    metrics.http_requests.inc(route, request.method, str(response.status_code))
+    if response.status_code >= 400:
+        metrics.http_errors.inc(route, f"http_{response.status_code}")
+    return response
+
+# Seconds a request may run before its agent calls are cancelled. Plans, assessments
+# and multi-step routes legitimately take longer than single short answers.
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "30"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", "120"))
+ROUTE_TIMEOUTS = {
+    "/api/health/profile/assessment": 60,
+    "/api/health/profile/intelligent-assessment": 60,
+    "/api/health/profile/intelligent-assessment/stream": 90,
+    "/api/health/profile/adaptive-program": 60,
+    "/api/health/workout/plan": 60,
+    "/api/health/workout/plan/stream": 90,
+    "/api/health/nutrition/meal-plan": 60,
+    "/api/health/nutrition/meal-plan/stream": 90,
+    "/api/health/info/educational-content": 60,
+    "/api/health/info/educational-content/stream": 90,
+    "/api/health/onboarding": 90,
+    "/api/health/batch": 90,
+}
+
+def request_timeout(request: Request) -> float:
+    """X-Request-Timeout-Ms if the client sent a valid one (capped), else the route's default"""
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            return min(max(float(header), 0.0) / 1000, MAX_REQUEST_TIMEOUT)
+        except ValueError:
+            pass
+    return ROUTE_TIMEOUTS.get(request.url.path, DEFAULT_REQUEST_TIMEOUT)
+
+@app.middleware("http")
+async def apply_request_options(request: Request, call_next):
+    # X-Model-Tier: small|large forces the model tier for every agent call of this request
+    tier = request.headers.get("x-model-tier")
+    requested_model_tier.set(tier.lower() if tier else None)
+    # X-Response-Detail: brief|standard|detailed scales the output token budget
+    detail = request.headers.get("x-response-detail")
+    requested_detail.set(detail.lower() if detail else None)
+    # Every agent call of this request is cancelled once the deadline passes
+    request_deadline.set(time.monotonic() + request_timeout(request))
+    return await call_next(request)
+
 # Initialize agents
 health_profile_agent = HealthProfileAgent()
 workout_agent = WorkoutPlanAgent()
@@ -45,6 +120,10 @@ class UserInfoRequest(BaseModel):
 class UserProfileRequest(BaseModel):
     user_profile: Dict[str, Any]
 
+class MealPlanRequest(BaseModel):
+    user_profile: Dict[str, Any]
+    parallel: Optional[bool] = None  # generate the days concurrently; defaults to MEAL_PLAN_PARALLEL
+
 class ExerciseAlternativeRequest(BaseModel):
     exercise: str
     equipment: Optional[str] = None
@@ -64,13 +143,15 @@ class FoodAlternativeRequest(BaseModel):
 
 class MealAnalysisRequest(BaseModel):
     meal_description: str
+    numbers_only: bool = False  # only the locally computed breakdown, no model commentary
 
 class NutritionTipsRequest(BaseModel):
     goal: str
 
 class ShoppingListRequest(BaseModel):
-    dietary_preference: str
+    dietary_preference: Optional[str] = None
     days: Optional[int] = 7
+    plan_id: Optional[str] = None  # from /api/health/nutrition/meal-plan; builds the list locally
 
 class ProgressAnalysisRequest(BaseModel):
     user_data: Dict[str, Any]
@@ -125,6 +206,71 @@ class ProgressGuidanceRequest(BaseModel):
     user_id: str
     query: str
 
+class OnboardingRequest(BaseModel):
+    user_profile: Dict[str, Any]
+    enrich_plans: Optional[bool] = False
+
+class BatchOperation(BaseModel):
+    operation: str  # route path below /api/health/, e.g. "workout/plan"
+    arguments: Dict[str, Any] = {}
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+def http_error(e: Exception) -> HTTPException:
+    """Map an agent failure to an HTTP error; an overloaded upstream becomes 429/503 with Retry-After"""
+    if isinstance(e, UpstreamBusy):
+        return HTTPException(
+            status_code=e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(
+            status_code=504,
+            detail="The response took longer than this request allows. Try again, or ask for a shorter "
+                   "answer with X-Response-Detail: brief.",
+        )
+    return HTTPException(status_code=500, detail=str(e))
+
+def error_detail(e: Exception) -> Dict[str, Any]:
+    """Error payload for stream events, where the HTTP status has already been sent"""
+    error = http_error(e)
+    detail = {'detail': error.detail, 'status_code': error.status_code}
+    if error.headers:
+        detail['retry_after'] = int(error.headers["Retry-After"])
+    return detail
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(chunks, on_complete: Optional[Callable[[str], Dict[str, Any]]] = None) -> StreamingResponse:
+    """
+    Forward agent output chunks to the client as Server-Sent Events. on_complete
+    receives the full content and its return value is sent as a "result" event.
+    """
+    async def events():
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event({'content': chunk})
+            if on_complete is not None:
+                yield sse_event(on_complete("".join(parts)), event="result")
+            yield sse_event({}, event="done")
+        except Exception as e:
+            yield sse_event(error_detail(e), event="error")
+
+    return event_stream_response(events())
+
+def event_stream_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Root endpoints
 @app.get("/")
 async def root():
@@ -134,249 +280,375 @@ async def root():
 async def health_check():
     return {"status": "healthy", "agents": ["health_profile", "workout", "nutrition", "progress", "health_info"]}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+@app.get("/api/context/stats")
+async def context_stats():
+    return dict(health_profile_agent.context_memory.stats(), history=health_profile_agent.history.stats())
+
+@app.get("/api/prompt/stats")
+async def prompt_stats():
+    return compaction_stats()
+
+@app.get("/api/upstream/stats")
+async def upstream_stats():
+    return upstream_limiter.stats()
+
+@app.get("/api/hedging/stats")
+async def hedging_stats():
+    return hedger.stats()
+
+@app.get("/api/output-budget/stats")
+async def output_budget_stats():
+    return output_budget.stats()
+
 # Health Profile Agent endpoints (using dynamic methods)
 @app.post("/api/health/profile/greet")
 async def profile_greet(request: UserTypeRequest):
     try:
         # Convert old format to new dynamic greeting format
         user_context = {"user_type": request.user_type, "time_of_day": "day"}
-        response = health_profile_agent.dynamic_greeting(user_context)
+        response = await health_profile_agent.dynamic_greeting(user_context)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/profile/suggest-program")
 async def profile_suggest_program(request: HealthInterestRequest):
     try:
         # Convert to adaptive program suggestion
         user_context = {"primary_goal": request.health_interest}
-        response = health_profile_agent.adaptive_program_suggestion(user_context)
+        response = await health_profile_agent.adaptive_program_suggestion(user_context)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/profile/assessment")
 async def profile_assessment(request: UserInfoRequest):
     try:
-        response = health_profile_agent.intelligent_assessment(request.user_info)
+        response = await health_profile_agent.intelligent_assessment(request.user_info)
         return {"response": response.get("assessment", "")}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 # Workout Plan Agent endpoints
 @app.post("/api/health/workout/plan")
 async def workout_plan(request: UserProfileRequest):
     try:
-        response = workout_agent.generate_workout_plan(request.user_profile)
+        response = await workout_agent.generate_workout_plan(request.user_profile)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.post("/api/health/workout/plan/stream")
+async def workout_plan_stream(request: UserProfileRequest):
+    return sse_response(workout_agent.stream_workout_plan(request.user_profile))
 
 @app.post("/api/health/workout/alternatives")
 async def workout_alternatives(request: ExerciseAlternativeRequest):
     try:
-        response = workout_agent.suggest_exercise_alternatives(
+        return await workout_agent.suggest_exercise_alternatives(
             request.exercise, request.equipment, request.difficulty
         )
-        return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/workout/quick")
 async def quick_workout(request: QuickWorkoutRequest):
     try:
-        response = workout_agent.create_quick_workout(
+        response = await workout_agent.create_quick_workout(
             request.time_available, request.focus_area, request.equipment
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/workout/form-guidance")
 async def workout_form_guidance(request: ExerciseFormRequest):
     try:
-        response = workout_agent.provide_form_guidance(request.exercise)
-        return {"response": response}
+        return await workout_agent.provide_form_guidance(request.exercise)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 # Nutrition Agent endpoints
 @app.post("/api/health/nutrition/meal-plan")
-async def nutrition_meal_plan(request: UserProfileRequest):
+async def nutrition_meal_plan(request: MealPlanRequest):
     try:
-        response = nutrition_agent.create_meal_plan(request.user_profile)
-        return {"response": response}
+        response = await nutrition_agent.create_meal_plan(request.user_profile, request.parallel)
+        return {"response": response, "plan_id": nutrition_agent.save_meal_plan(response, request.user_profile)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.post("/api/health/nutrition/meal-plan/stream")
+async def nutrition_meal_plan_stream(request: MealPlanRequest):
+    return sse_response(
+        nutrition_agent.stream_meal_plan(request.user_profile, request.parallel),
+        on_complete=lambda plan: {'plan_id': nutrition_agent.save_meal_plan(plan, request.user_profile)},
+    )
 
 @app.post("/api/health/nutrition/food-alternatives")
 async def nutrition_food_alternatives(request: FoodAlternativeRequest):
     try:
-        response = nutrition_agent.suggest_food_alternatives(
+        return await nutrition_agent.suggest_food_alternatives(
             request.food, request.dietary_restriction
         )
-        return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/nutrition/analyze-meal")
 async def nutrition_analyze_meal(request: MealAnalysisRequest):
     try:
-        response = nutrition_agent.analyze_meal(request.meal_description)
-        return {"response": response}
+        return await nutrition_agent.analyze_meal(request.meal_description, request.numbers_only)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/nutrition/tips")
 async def nutrition_tips(request: NutritionTipsRequest):
     try:
-        response = nutrition_agent.provide_nutrition_tips(request.goal)
+        response = await nutrition_agent.provide_nutrition_tips(request.goal)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/nutrition/shopping-list")
 async def nutrition_shopping_list(request: ShoppingListRequest):
+    if request.plan_id is None and not request.dietary_preference:
+        raise HTTPException(status_code=422, detail="Send either plan_id or dietary_preference")
     try:
-        response = nutrition_agent.create_shopping_list(
-            request.dietary_preference, request.days
-        )
-        return {"response": response}
+        if request.plan_id is not None:
+            shopping_list = await nutrition_agent.shopping_list_for_plan(request.plan_id)
+        else:
+            response = await nutrition_agent.create_shopping_list(
+                request.dietary_preference, request.days
+            )
+            shopping_list = {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+    if shopping_list is None:
+        raise HTTPException(status_code=404, detail=f"Unknown meal plan '{request.plan_id}'")
+    return shopping_list
 
 # Progress Tracking Agent endpoints
 @app.post("/api/health/progress/analyze")
 async def progress_analyze(request: ProgressAnalysisRequest):
     try:
-        response = progress_agent.analyze_progress(request.user_data)
+        response = await progress_agent.analyze_progress(request.user_data)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/progress/adjustments")
 async def progress_adjustments(request: PlanAdjustmentRequest):
     try:
-        response = progress_agent.suggest_plan_adjustments(
+        response = await progress_agent.suggest_plan_adjustments(
             request.current_plan, request.progress_data
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/progress/milestone-plan")
 async def progress_milestone_plan(request: MilestonePlanRequest):
     try:
-        response = progress_agent.create_milestone_plan(
+        response = await progress_agent.create_milestone_plan(
             request.goal, request.current_status, request.timeframe
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/progress/plateau")
 async def progress_plateau(request: PlateauRequest):
     try:
-        response = progress_agent.address_plateau(request.plateau_data)
+        response = await progress_agent.address_plateau(request.plateau_data)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/progress/celebrate")
 async def progress_celebrate(request: AchievementRequest):
     try:
-        response = progress_agent.celebrate_achievement(request.achievement)
+        response = await progress_agent.celebrate_achievement(request.achievement)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 # Health Info Agent endpoints
 @app.post("/api/health/info/explain-concept")
 async def health_info_explain_concept(request: HealthConceptRequest):
     try:
-        response = health_info_agent.explain_health_concept(request.concept)
+        response = await health_info_agent.explain_health_concept(request.concept)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/info/answer-question")
 async def health_info_answer_question(request: HealthQuestionRequest):
     try:
-        response = health_info_agent.answer_health_question(request.question)
+        response = await health_info_agent.answer_health_question(request.question)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/info/debunk-myth")
 async def health_info_debunk_myth(request: HealthMythRequest):
     try:
-        response = health_info_agent.debunk_health_myth(request.myth)
+        response = await health_info_agent.debunk_health_myth(request.myth)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/info/research")
 async def health_info_research(request: ResearchRequest):
     try:
-        response = health_info_agent.provide_research_summary(request.research_topic)
+        response = await health_info_agent.provide_research_summary(request.research_topic)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/info/educational-content")
 async def health_info_educational_content(request: EducationalContentRequest):
     try:
-        response = health_info_agent.create_educational_content(
+        response = await health_info_agent.create_educational_content(
             request.topic, request.format_type
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.post("/api/health/info/educational-content/stream")
+async def health_info_educational_content_stream(request: EducationalContentRequest):
+    return sse_response(
+        health_info_agent.stream_educational_content(request.topic, request.format_type)
+    )
 
 @app.post("/api/health/info/compare")
 async def health_info_compare(request: CompareApproachesRequest):
     try:
-        response = health_info_agent.compare_health_approaches(
+        response = await health_info_agent.compare_health_approaches(
             request.approach1, request.approach2, request.goal
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/profile/dynamic-greeting")
 async def profile_dynamic_greeting(request: DynamicGreetingRequest):
     try:
-        response = health_profile_agent.dynamic_greeting(request.user_context)
+        response = await health_profile_agent.dynamic_greeting(request.user_context)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/profile/intelligent-assessment")
 async def profile_intelligent_assessment(request: IntelligentAssessmentRequest):
     try:
-        response = health_profile_agent.intelligent_assessment(request.user_data)
+        response = await health_profile_agent.intelligent_assessment(request.user_data)
         return response
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.post("/api/health/profile/intelligent-assessment/stream")
+async def profile_intelligent_assessment_stream(request: IntelligentAssessmentRequest):
+    return sse_response(health_profile_agent.stream_intelligent_assessment(request.user_data))
 
 @app.post("/api/health/profile/adaptive-program")
 async def profile_adaptive_program(request: AdaptiveProgramRequest):
     try:
-        response = health_profile_agent.adaptive_program_suggestion(request.user_context)
+        response = await health_profile_agent.adaptive_program_suggestion(request.user_context)
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/api/health/profile/progress-guidance")
 async def profile_progress_guidance(request: ProgressGuidanceRequest):
     try:
-        response = health_profile_agent.progress_aware_guidance(
+        response = await health_profile_agent.progress_aware_guidance(
             request.user_id, 
             request.query
         )
         return {"response": response}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.post("/api/health/onboarding")
+async def health_onboarding(request: OnboardingRequest):
+    """Run the onboarding agents as a DAG and stream each step's result as it completes"""
+    pipeline = build_onboarding_pipeline(
+        health_profile_agent, workout_agent, nutrition_agent,
+        request.user_profile, enrich_plans=request.enrich_plans
+    )
+
+    async def events():
+        async for name, result, error in pipeline.run():
+            if error is None:
+                yield sse_event({'step': name, 'result': result}, event="result")
+            else:
+                yield sse_event({'step': name, **error_detail(error)}, event="error")
+        yield sse_event({}, event="done")
+
+    return event_stream_response(events())
+
+# Batch endpoint: run several agent operations concurrently in one round trip
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "20"))
+BATCH_PREFIX = "/api/health/"
+BATCH_EXCLUDED = {"/api/health/onboarding"}  # event streams can't be embedded in a batch result
+
+def _batchable_operations() -> Dict[str, Any]:
+    """Map each JSON agent route to its request model and handler"""
+    operations = {}
+    for route in app.routes:
+        path = getattr(route, "path", "")
+        if (not path.startswith(BATCH_PREFIX) or path.endswith("/stream") or path in BATCH_EXCLUDED
+                or "POST" not in getattr(route, "methods", ())):
+            continue
+        parameter = inspect.signature(route.endpoint).parameters.get("request")
+        if parameter is not None:
+            operations[path[len(BATCH_PREFIX):]] = (parameter.annotation, route.endpoint)
+    return operations
+
+BATCH_OPERATIONS = _batchable_operations()
+
+@app.post("/api/health/batch")
+async def health_batch(request: BatchRequest):
+    if len(request.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {BATCH_MAX_OPERATIONS} operations"
+        )
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_operation(operation: BatchOperation) -> Dict[str, Any]:
+        result = {"id": operation.id, "operation": operation.operation}
+        if operation.operation not in BATCH_OPERATIONS:
+            result["error"] = {"status_code": 404, "detail": f"Unknown operation '{operation.operation}'"}
+            return result
+        request_model, handler = BATCH_OPERATIONS[operation.operation]
+        try:
+            payload = request_model(**operation.arguments)
+        except ValidationError as e:
+            result["error"] = {"status_code": 422, "detail": e.errors(include_url=False)}
+            return result
+        try:
+            async with semaphore:
+                result["result"] = await handler(payload)
+        except HTTPException as e:
+            result["error"] = {"status_code": e.status_code, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                result["error"]["retry_after"] = int(e.headers["Retry-After"])
+        return result
+
+    results = await asyncio.gather(*(run_operation(op) for op in request.operations))
+    return {"results": results}
+
+KNOWN_ROUTES = {getattr(route, "path", None) for route in app.routes}
 
 def main():
     print("Starting Health AI Agents Server...")
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import asyncio
 from healthAgents.health_profile_agent import HealthProfileAgent
 
 def test_health_profile_agent():
@@ -30,7 +31,7 @@ def test_health_profile_agent():
             "goals": ["muscle-gain"],
             "visit_count": 1
         }
-        greeting = agent.dynamic_greeting(context)
+        greeting = asyncio.run(agent.dynamic_greeting(context))
         print("✅ Dynamic greeting works")
         print(f"Greeting: {greeting[:100]}...")
     except Exception as e:
@@ -49,7 +50,7 @@ def test_health_profile_agent():
             "medical_conditions": ["Back Problems"]
         }
         
-        result = agent.intelligent_assessment(test_data)
+        result = asyncio.run(agent.intelligent_assessment(test_data))
         print("✅ Intelligent assessment works")
         print(f"Assessment preview: {result['assessment'][:100]}...")
         
@@ -58,7 +59,7 @@ def test_health_profile_agent():
     
     print("\n=== Testing Progress Guidance ===")
     try:
-        guidance = agent.progress_aware_guidance("test_user", "Give me a health tip")
+        guidance = asyncio.run(agent.progress_aware_guidance("test_user", "Give me a health tip"))
         print("✅ Progress guidance works")
         print(f"Guidance preview: {guidance[:100]}...")
     except Exception as e:
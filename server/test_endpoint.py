@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import asyncio
 import sys
 import traceback
 from healthAgents.health_profile_agent import HealthProfileAgent
@@ -38,7 +39,7 @@ def test_intelligent_assessment():
         }
         
         print("=== Testing intelligent_assessment ===")
-        result = agent.intelligent_assessment(test_data)
+        result = asyncio.run(agent.intelligent_assessment(test_data))
         print("✅ intelligent_assessment worked!")
         print(f"Response type: {type(result)}")
         print(f"Response keys: {result.keys() if isinstance(result, dict) else 'Not a dict'}")
@@ -54,7 +55,7 @@ def test_intelligent_assessment():
             "goals": ["muscle-gain"],
             "visit_count": 1
         }
-        greeting = agent.dynamic_greeting(greeting_context)
+        greeting = asyncio.run(agent.dynamic_greeting(greeting_context))
         print("✅ dynamic_greeting worked!")
         print(f"Greeting: {greeting[:100]}...")
         